@@ -3,17 +3,29 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
+import csv
+import base64
+import binascii
+import functools
+import hashlib
+import time
+import click
+from flask import Flask, Blueprint, current_app, render_template, request, Response, flash, redirect, url_for, abort, g, session, stream_with_context
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
-from flask_migrate import Migrate
+from extensions import db, init_migrate
+from models import *
 from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
+from werkzeug.http import is_resource_modified
+from datetime import datetime, timezone
+from cache import PageCache
+from pooling import engine_options, pool_stats
+import instrumentation
+import metrics
+import profiling
 import sys
 
 
@@ -21,40 +33,349 @@ import sys
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
+# the routes, filters, hooks and commands below are registered on bp, which
+# create_app attaches to each new application
+bp = Blueprint('main', __name__, cli_group=None)
+
+def create_app(config='config', **settings):
+  # builds an application from a config object (module path) and overrides,
+  # e.g. create_app(SQLALCHEMY_DATABASE_URI=...); run with FLASK_APP=app.py
+  # or a WSGI server pointed at 'app:create_app()'
+  app = Flask(__name__)
+  app.config.from_object(config)
+  app.config.update(settings)
+  app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+  # TODO: connect to a local postgresql database --- DONE
+  db.init_app(app)
+  init_migrate(app)
+  # rendered pages of the read routes, None when CACHE_BACKEND is unset
+  app.extensions['page_cache'] = PageCache.from_config(app.config)
+  app.register_blueprint(bp)
+  instrumentation.init_app(app)
+  metrics.init_app(app, runtime_metrics)
+  profiling.init_app(app)
+
+  if not app.debug:
+    file_handler = FileHandler('error.log')
+    file_handler.setFormatter(
+        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+    )
+    app.logger.setLevel(logging.INFO)
+    file_handler.setLevel(logging.INFO)
+    app.logger.addHandler(file_handler)
+    app.logger.info('errors')
+  return app
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+# babel and dateutil are only imported once a page formats a date or parses
+# one, not by every process that imports the app (workers, CLI, migrations)
+
+@functools.lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+  # compiled Babel pattern and parsed locale, resolved once per (format, locale);
+  # locale None is the system's LC_TIME
+  import babel
+  import babel.dates
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale or babel.dates.LC_TIME)
+
+def parse_datetime(value):
+  import dateutil.parser
+  return dateutil.parser.parse(value)
+
+@bp.app_template_filter('datetime')
+def format_datetime(value, format='medium', locale=None):
+  # accepts datetime objects as returned by the db; strings are still parsed
+  if isinstance(value, str):
+    value = parse_datetime(value)
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(value, locale)
+
+def format_datetimes(values, format='medium', locale=None):
+  # formats a whole list of timestamps with a single pattern lookup
+  pattern, locale = datetime_pattern(format, locale)
+  return [pattern.apply(parse_datetime(value) if isinstance(value, str) else value, locale)
+          for value in values]
 
-migrate = Migrate(app,db)
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
 
-# TODO: connect to a local postgresql database --- DONE
+# Listings are paginated by keyset: each page continues strictly after the
+# sort key of the previous page's last row, so deep pages cost the same as
+# the first one and rows inserted meanwhile do not shift the pages. Keys are
+# never NULL: the row comparison would be NULL too and skip those rows, so
+# nullable columns are sorted through sort_key.
+
+def encode_cursor(values):
+  values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+  return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def sort_key(column):
+  # a nullable string column as a key, NULL sorting as '' (labelled with the
+  # column's name, so rows and cursors read it as the column)
+  return db.func.coalesce(column, '').label(column.key)
+
+def cursor_value(key, value):
+  # a token value as the key column's Python type, anything else (e.g. a
+  # number for a name, null, a list or a dict) is rejected before it reaches SQL
+  if isinstance(key.type, db.DateTime):
+    if not isinstance(value, str):
+      raise ValueError(value)
+    return datetime.fromisoformat(value)
+  python_type = key.type.python_type
+  if not isinstance(value, python_type) or (python_type is int and isinstance(value, bool)):
+    raise ValueError(value)
+  return value
+
+def decode_cursor(token, keys):
+  try:
+    values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    if not isinstance(values, list) or len(values) != len(keys):
+      raise ValueError(token)
+    return [cursor_value(key, value) for key, value in zip(keys, values)]
+  except (ValueError, TypeError, binascii.Error):
+    abort(400)
+
+def page_size():
+  per_page = request.args.get('per_page', current_app.config['PAGE_SIZE'], type=int)
+  return max(1, min(per_page, current_app.config['MAX_PAGE_SIZE']))
+
+def keyset_query(query, keys):
+  # restricts query to the requested page plus one row, which tells whether
+  # there is a next page; returns the query and the page size
+  token = request.args.get('after')
+  if token:
+    query = query.filter(db.tuple_(*keys) > db.tuple_(*decode_cursor(token, keys)))
+  size = page_size()
+  return query.order_by(*keys).limit(size + 1), size
+
+def keyset_page(query, keys):
+  # returns one page of rows ordered by keys and the token of the next page
+  # (None on the last page); every key column must be part of the rows
+  query, size = keyset_query(query, keys)
+  rows = query.all()
+  if len(rows) <= size:
+    return rows, None
+  rows = rows[:size]
+  return rows, encode_cursor([getattr(rows[-1], key.key) for key in keys])
+
+class StreamedPage:
+  # iterates a keyset page as its rows arrive from a server-side cursor,
+  # converted by row(); next_page is only known once the iteration is done
+  def __init__(self, query, keys, row, batch_size=100):
+    self.query, self.size = keyset_query(query, keys)
+    self.keys = keys
+    self.row = row
+    self.batch_size = batch_size
+    self.next_page = None
+
+  def __iter__(self):
+    last = None
+    for count, item in enumerate(self.query.yield_per(self.batch_size)):
+      if count == self.size:
+        self.next_page = encode_cursor([getattr(last, key.key) for key in self.keys])
+        break
+      last = item
+      yield self.row(item)
+
+def stream_template(template_name, **context):
+  # renders a template chunk by chunk, to be sent as it is produced
+  current_app.update_template_context(context)
+  stream = current_app.jinja_env.get_template(template_name).stream(context)
+  stream.enable_buffering(current_app.config['STREAM_BUFFER_SIZE'])
+  return stream
 
 #----------------------------------------------------------------------------#
-# 2nd Import for Models.
+# Conditional requests.
 #----------------------------------------------------------------------------#
 
-from models import *
+# Detail pages and the show listing send an ETag and Last-Modified derived
+# from the updated_at columns of the rows they display, and answer 304
+# before loading or rendering anything when the client's copy is current.
+
+def not_modified(last_modified, *state):
+  # last_modified is an aware UTC datetime (None when there is nothing to
+  # validate) and state any extra values the page depends on; returns a 304
+  # response when the request's validators match, None otherwise
+  if last_modified is None:
+    return None
+  etag = hashlib.md5(repr((last_modified.isoformat(), state)).encode()).hexdigest()
+  g.validators = (etag, last_modified)
+  # pending flash messages are part of the page, never hide them behind a 304
+  if '_flashes' in session:
+    return None
+  if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+    return None
+  return Response(status=304)
+
+@bp.after_app_request
+def set_validators(response):
+  if 'validators' in g and response.status_code in (200, 304):
+    etag, last_modified = g.validators
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # caches (the CDN included) may keep the page but must revalidate it
+    response.cache_control.no_cache = True
+  return response
+
+def show_page_validators(model, key, other, other_key, entity_id, now):
+  # validators of a venue or artist page: the latest update of the entity,
+  # its shows and the other side of those shows, moved forward to the latest
+  # show that has started by now, since the page splits past/upcoming at now
+  updated_at, last_started, shows = db.session.query(
+    db.func.greatest(db.func.max(model.updated_at), db.func.max(Show.updated_at), db.func.max(other.updated_at)),
+    db.func.max(db.case([(Show.start_time <= now, Show.start_time)])),
+    db.func.count(Show.id)
+  ).select_from(model).outerjoin(Show, key == model.id).outerjoin(other, other_key == other.id).filter(model.id == entity_id).one()
+  if updated_at is None:
+    return None, shows
+  # updated_at is stored in UTC, start times in local time
+  last_modified = updated_at.replace(tzinfo=timezone.utc)
+  if last_started is not None:
+    last_modified = max(last_modified, last_started.astimezone(timezone.utc))
+  return last_modified, shows
+
+def shows_last_modified():
+  # any change to a show, artist or venue may change the show listing
+  updated_at = db.session.query(db.func.greatest(
+    db.session.query(db.func.max(Show.updated_at)).as_scalar(),
+    db.session.query(db.func.max(Artist.updated_at)).as_scalar(),
+    db.session.query(db.func.max(Venue.updated_at)).as_scalar()
+  )).scalar()
+  return updated_at and updated_at.replace(tzinfo=timezone.utc)
 
 #----------------------------------------------------------------------------#
-# Filters.
+# Page cache.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+def cached_page(*tags):
+  # caches the page rendered by a read view under its endpoint, arguments and
+  # query string; tags name what the page shows ('venue:{venue_id}' is
+  # formatted with the view arguments) and are invalidated by the writes
+  def decorator(view):
+    @functools.wraps(view)
+    def wrapper(**kwargs):
+      page_cache = current_app.extensions['page_cache']
+      # pending flash messages are rendered into the page, never cache those;
+      # profiled requests must render it
+      if page_cache is None or '_flashes' in session or 'profile' in g:
+        return view(**kwargs)
+      key = f'{request.endpoint}:{sorted(kwargs.items())}:{request.query_string.decode()}'
+      page_tags = [tag.format(**kwargs) for tag in tags]
+      page, generations = page_cache.lookup(key, page_tags)
+      if page is not None:
+        body, validators = page
+        if validators:
+          g.validators = validators
+          if not is_resource_modified(request.environ, etag=validators[0], last_modified=validators[1]):
+            return Response(status=304)
+        return body
+      response = view(**kwargs)
+      # a page rendered from the replica right after a write may predate it,
+      # storing it under the new generation would serve it until it expires
+      stale = (rendered_from_replica()
+               and page_cache.changed_within(page_tags, current_app.config['REPLICA_LAG']))
+      if isinstance(response, str) and not stale:
+        page_cache.store(key, (response, g.get('validators')), generations, g.get('cache_ttl'))
+      return response
+    return wrapper
+  return decorator
+
+def invalidate_pages(*tags):
+  # with the memory backend this only reaches the cache of the current
+  # process, not the other workers' nor, from a command, the server's
+  page_cache = current_app.extensions['page_cache']
+  if page_cache is not None:
+    page_cache.invalidate(*tags)
+
+def venue_page_tags(venue_id, artist_ids=None):
+  # pages showing a venue: its own, the listings and its artists' pages;
+  # artist_ids are queried unless already known
+  if artist_ids is None:
+    artist_ids = [artist_id for artist_id, in db.session.query(Show.artist_id).filter_by(venue_id=venue_id).distinct()]
+  return ['venues', 'shows', f'venue:{venue_id}'] + [f'artist:{artist_id}' for artist_id in artist_ids]
+
+def artist_page_tags(artist_id, venue_ids=None):
+  # pages showing an artist: their own, the listings and their venues' pages;
+  # venue_ids are queried unless already known
+  if venue_ids is None:
+    venue_ids = [venue_id for venue_id, in db.session.query(Show.venue_id).filter_by(artist_id=artist_id).distinct()]
+  return ['artists', 'shows', f'artist:{artist_id}'] + [f'venue:{venue_id}' for venue_id in venue_ids]
+
+def expire_at_next_show(upcoming_shows, now):
+  # a detail page changes when its next upcoming show starts
+  if upcoming_shows:
+    g.cache_ttl = (upcoming_shows[0]['start_time'] - now).total_seconds()
+
+#----------------------------------------------------------------------------#
+# Read replica.
+#----------------------------------------------------------------------------#
 
-app.jinja_env.filters['datetime'] = format_datetime
+# Views decorated with read_replica only read, and run their queries on the
+# 'replica' bind when one is configured (see RoutingSession). Everything else,
+# the edit forms included (they must show the current version), uses the
+# primary. A client that has just written reads from the primary for
+# REPLICA_LAG seconds, which covers the redirect after the write; the POSTs
+# of these views (searches) do not count as writes. For as long, pages
+# rendered from the replica are not cached under the tags the write
+# invalidated (see cached_page).
+
+@bp.before_app_request
+def use_primary():
+  g.read_replica = False
+
+def read_replica(view):
+  @functools.wraps(view)
+  def wrapper(*args, **kwargs):
+    g.read_only = True
+    g.read_replica = session.get('read_primary_until', 0) < time.time()
+    return view(*args, **kwargs)
+  return wrapper
+
+def rendered_from_replica():
+  return bool(g.get('read_replica') and current_app.config['SQLALCHEMY_BINDS'].get('replica'))
+
+@bp.after_app_request
+def remember_writes(response):
+  if (request.method not in ('GET', 'HEAD') and not g.get('read_only') and response.status_code < 400
+      and current_app.config['SQLALCHEMY_BINDS'].get('replica')):
+    session['read_primary_until'] = time.time() + current_app.config['REPLICA_LAG']
+  return response
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def search_by_name(model, search_term):
+  # case-insensitive partial match on name ("Hop" finds "The Musical Hop"),
+  # served by the pg_trgm GIN index on name, closest names first
+  pattern = '%' + search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+  results = db.session.query(
+    model.id,
+    model.name,
+    db.func.count().over().label('total')
+  ).filter(model.name.ilike(pattern, escape='\\')).order_by(
+    db.func.similarity(model.name, search_term).desc(), model.name, model.id
+  ).limit(current_app.config['SEARCH_RESULTS_LIMIT']).all()
+
+  return {
+    "count": results[0].total if results else 0,
+    "data": [{"id": result.id, "name": result.name} for result in results]
+  }
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@bp.route('/')
 def index():
   return render_template('pages/home.html')
 
@@ -62,100 +383,91 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@bp.route('/venues')
+@read_replica
+@cached_page('venues')
 def venues():
-  data = []
-  
-  # step taken to query all venues
-  venues = Venue.query.all()
-
-  # step implemented to avoid duplicate venues
-  fulllocations = set()
-
-  for venue in venues:
-    # then we convert to tuples and add city & state data
-    fulllocations.add((venue.city, venue.state))
-
-  # check each unique city & state, then add venue data
-  for fulllocation in fulllocations:
-    data.append({
-        "city": fulllocation[0],
-        "state": fulllocation[1],
+  # upcoming shows come from the venue's own counter, kept up to date when
+  # shows are created or deleted and by the rollover-shows command
+  state, city = sort_key(Venue.state), sort_key(Venue.city)
+  venues, next_page = keyset_page(db.session.query(
+    Venue.id,
+    Venue.name,
+    city,
+    state,
+    Venue.upcoming_shows_count
+  ), (state, city, Venue.id))
+
+  # group venues by city & state, rows already come sorted by area
+  areas = {}
+  for venue_id, name, city, state, upcoming in venues:
+    if (city, state) not in areas:
+      areas[(city, state)] = {
+        "city": city,
+        "state": state,
         "venues": []
+      }
+    areas[(city, state)]['venues'].append({
+      "id": venue_id,
+      "name": name,
+      "upcoming_shows": upcoming
     })
+  return render_template('pages/venues.html', areas=list(areas.values()), next_page=next_page)
 
-  for venue in venues:
-
-    upcoming_shows = 0
-
-    shows = Show.query.filter_by(venue_id=venue.id).all()
-    
-    #check for show start time to established if it is an upcoming or past show
-    for show in shows:
-      if show.start_time > datetime.now():
-          upcoming_shows += 1
-
-    #join show data to the proper venue based on city/state
-    for venue_location in data:
-      if venue.state == venue_location['state'] and venue.city == venue_location['city']:
-        venue_location['venues'].append({
-            "id": venue.id,
-            "name": venue.name,
-            "upcoming_shows": upcoming_shows
-        })
-  return render_template('pages/venues.html', areas=data)
-
-@app.route('/venues/search', methods=['POST'])
+@bp.route('/venues/search', methods=['POST'])
+@read_replica
 def search_venues():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee" --- DONE
   search_term = request.form.get('search_term', '')
 
-  #implemeting search using % for partial search
-  venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
-
-  response = {
-    "count": len(venues),
-    "data": []
-  }
-
-  #get teh results to show them
-  for venue in venues:
-    response['data'].append({
-        "id": venue.id,
-        "name": venue.name
-      })
+  response = search_by_name(Venue, search_term)
 
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
-@app.route('/venues/<int:venue_id>')
+@bp.route('/venues/<int:venue_id>')
+@read_replica
+@cached_page('venue:{venue_id}')
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
   # TODO: replace with real venue data from the venues table, using venue_id --- DONE
-  venue = Venue.query.get(venue_id)
-  
+  now = datetime.now()
+  response = not_modified(*show_page_validators(Venue, Show.venue_id, Artist, Show.artist_id, venue_id, now))
+  if response:
+    return response
+
+  # the venue and its shows, with only the artist columns the page uses,
+  # come back in a single round trip sorted by start time
+  rows = db.session.query(
+    Venue,
+    Show.start_time,
+    Show.artist_id,
+    Artist.name,
+    Artist.image_link
+  ).outerjoin(Show, Show.venue_id == Venue.id).outerjoin(Artist, Show.artist_id == Artist.id).filter(Venue.id == venue_id).order_by(Show.start_time, Show.id).all()
+  if not rows:
+    abort(404)
+  venue = rows[0][0]
+
   past_shows_venue = []
   upcoming_shows_venue = []
 
-  query_upcoming_shows_venue = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time>datetime.now()).all()
-  query_past_shows_venue = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time<datetime.now()).all()
-
-  for show in query_past_shows_venue:
-    past_shows_venue.append({
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": format_datetime(str(show.start_time))
-    })
-
-  for show in query_upcoming_shows_venue:
-    upcoming_shows_venue.append({
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": format_datetime(str(show.start_time))    
-    })
+  # split at the single timestamp captured above, so no show falls in between
+  for _, start_time, artist_id, artist_name, artist_image_link in rows:
+    if start_time is None:
+      continue
+    show = {
+      "artist_id": artist_id,
+      "artist_name": artist_name,
+      "artist_image_link": artist_image_link,
+      "start_time": start_time
+    }
+    if start_time > now:
+      upcoming_shows_venue.append(show)
+    else:
+      past_shows_venue.append(show)
+  expire_at_next_show(upcoming_shows_venue, now)
 
   data = {
     "id": venue.id,
@@ -181,12 +493,12 @@ def show_venue(venue_id):
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@bp.route('/venues/create', methods=['GET'])
 def create_venue_form():
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/create', methods=['POST'])
+@bp.route('/venues/create', methods=['POST'])
 def create_venue_submission():
   # TODO: insert form data as a new Venue record in the db, instead --- DONE
   error = False
@@ -217,17 +529,22 @@ def create_venue_submission():
       print(sys.exc_info())
   else:
     # on successful db insert, flash success
+      invalidate_pages('venues')
       flash('Venue ' + request.form['name'] + ' was successfully listed!')
   return render_template('pages/home.html')
 
 
-@app.route('/venues/<int:venue_id>', methods=['DELETE'])
+@bp.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
   # TODO: Complete this endpoint for taking a venue_id, and using --- DONE
   # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
   error = False
   try:
     venue = Venue.query.get(venue_id)
+    tags = venue_page_tags(venue_id)
+    # the venue's shows are deleted with it, so take them off the counters first
+    count_shows([Show.venue_id == venue_id], sign=-1)
+    Show.query.filter_by(venue_id=venue_id).delete(synchronize_session=False)
     db.session.delete(venue)
     db.session.commit()
   except:
@@ -238,9 +555,10 @@ def delete_venue(venue_id):
   if error:
     flash('An error occurred. Venue was not deleted.')
     print(sys.exc_info())
-    return redirect(url_for('venues'))
+    return redirect(url_for('main.venues'))
   else:
     # on successful db insert, flash success
+    invalidate_pages(*tags)
     flash('Venue deleted')
     return render_template('pages/home.html')
   # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
@@ -251,65 +569,72 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@bp.route('/artists')
+@read_replica
+@cached_page('artists')
 def artists():
   # TODO: replace with real data returned from querying the database --- DONE
     
-  # query all artists
-  data = Artist.query.all()
+  # query one page of artists, by name
+  name = sort_key(Artist.name)
+  data, next_page = keyset_page(db.session.query(Artist.id, name), (name, Artist.id))
 
-  return render_template('pages/artists.html', artists=data)
+  return render_template('pages/artists.html', artists=data, next_page=next_page)
 
-@app.route('/artists/search', methods=['POST'])
+@bp.route('/artists/search', methods=['POST'])
+@read_replica
 def search_artists():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band". --- DONE
   search_term = request.form.get('search_term', '')
 
-  #implemeting search using % for partial search
-  artists = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()
-
-  response = {
-    "count": len(artists),
-    "data": []
-  }
-
-  for artist in artists:
-    response['data'].append({
-        "id": artist.id,
-        "name": artist.name
-      })
+  response = search_by_name(Artist, search_term)
 
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
-@app.route('/artists/<int:artist_id>')
+@bp.route('/artists/<int:artist_id>')
+@read_replica
+@cached_page('artist:{artist_id}')
 def show_artist(artist_id):
   # shows the venue page with the given venue_id
   # TODO: replace with real venue data from the venues table, using venue_id --- DONE
-  artist = Artist.query.get(artist_id)
-    
+  now = datetime.now()
+  response = not_modified(*show_page_validators(Artist, Show.artist_id, Venue, Show.venue_id, artist_id, now))
+  if response:
+    return response
+
+  # the artist and their shows, with only the venue columns the page uses,
+  # come back in a single round trip sorted by start time
+  rows = db.session.query(
+    Artist,
+    Show.start_time,
+    Show.venue_id,
+    Venue.name,
+    Venue.image_link
+  ).outerjoin(Show, Show.artist_id == Artist.id).outerjoin(Venue, Show.venue_id == Venue.id).filter(Artist.id == artist_id).order_by(Show.start_time, Show.id).all()
+  if not rows:
+    abort(404)
+  artist = rows[0][0]
+
   past_shows_artist = []
   upcoming_shows_artist = []
 
-  query_upcoming_shows_artist = Show.query.filter_by(artist_id=artist_id).join(Venue, Show.venue_id == Venue.id).filter(Show.start_time>datetime.now()).all()
-  query_past_shows_artist = Show.query.filter_by(artist_id=artist_id).join(Venue, Show.venue_id == Venue.id).filter(Show.start_time<datetime.now()).all()
-
-  for show in query_past_shows_artist:
-    past_shows_artist.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
-      "start_time": format_datetime(str(show.start_time))
-    })  
-
-  for show in query_upcoming_shows_artist:
-    upcoming_shows_artist.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
-      "start_time": format_datetime(str(show.start_time))
-    })
+  # split at the single timestamp captured above, so no show falls in between
+  for _, start_time, venue_id, venue_name, venue_image_link in rows:
+    if start_time is None:
+      continue
+    show = {
+      "venue_id": venue_id,
+      "venue_name": venue_name,
+      "venue_image_link": venue_image_link,
+      "start_time": start_time
+    }
+    if start_time > now:
+      upcoming_shows_artist.append(show)
+    else:
+      past_shows_artist.append(show)
+  expire_at_next_show(upcoming_shows_artist, now)
 
   data = {
     "id": artist.id,
@@ -333,7 +658,61 @@ def show_artist(artist_id):
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+
+# edit forms carry the version of the row they were rendered from and its
+# original values; a submission writes the fields that differ from those in
+# one UPDATE ... WHERE id AND version, which misses when someone else saved
+# the row in between
+
+ARTIST_FIELDS = ('name', 'city', 'state', 'phone', 'genres', 'image_link', 'facebook_link', 'website',
+                 'seeking_venue', 'seeking_description')
+VENUE_FIELDS = ('name', 'city', 'state', 'address', 'phone', 'genres', 'image_link', 'facebook_link', 'website',
+                'seeking_talent', 'seeking_description')
+
+def artist_form_values():
+  return {
+    'name': request.form['name'],
+    'city': request.form['city'],
+    'state': request.form['state'],
+    'phone': request.form['phone'],
+    'genres': request.form.getlist('genres'),
+    'image_link': request.form['image_link'],
+    'facebook_link': request.form['facebook_link'],
+    'website': request.form['website'],
+    'seeking_venue': True if 'seeking_venue' in request.form else False,
+    'seeking_description': request.form['seeking_description']
+  }
+
+def venue_form_values():
+  return {
+    'name': request.form['name'],
+    'city': request.form['city'],
+    'state': request.form['state'],
+    'address': request.form['address'],
+    'phone': request.form['phone'],
+    'genres': request.form.getlist('genres'),
+    'image_link': request.form['image_link'],
+    'facebook_link': request.form['facebook_link'],
+    'website': request.form['website'],
+    'seeking_talent': True if 'seeking_talent' in request.form else False,
+    'seeking_description': request.form['seeking_description']
+  }
+
+def original_values(data, fields):
+  # the editable values of a row, as the edit form's hidden "original" field
+  # (empty columns are submitted as '')
+  return json.dumps({name: '' if data[name] is None else data[name] for name in fields})
+
+def changed_values(values):
+  # the submitted values that differ from the form's original ones, all of
+  # them when the originals are missing
+  try:
+    original = json.loads(request.form.get('original', ''))
+  except ValueError:
+    original = {}
+  return {name: value for name, value in values.items() if name not in original or original[name] != value}
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   form = ArtistForm()
   
@@ -350,30 +729,27 @@ def edit_artist(artist_id):
     "facebook_link": artist.facebook_link,
     "seeking_venue": artist.seeking_venue,
     "seeking_description": artist.seeking_description,
-    "image_link": artist.image_link
+    "image_link": artist.image_link,
+    "version": artist.version
   }
+  artist_data['original'] = original_values(artist_data, ARTIST_FIELDS)
   # TODO: populate form with fields from artist with ID <artist_id> --- DONE
   return render_template('forms/edit_artist.html', form=form, artist=artist_data)
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
   # TODO: take values from the form submitted, and update existing --- DONE
   # artist record with ID <artist_id> using the new attributes
   error = False
-  artist = Artist.query.get(artist_id)
+  updated = None
+  changes = None
   try:
     #Updated edit_artist.html file to get with default/current values, in order to avoid lost of data when updating
-      artist.name = request.form['name']
-      artist.city = request.form['city']
-      artist.state = request.form['state']
-      artist.phone = request.form['phone']
-      artist.genres = request.form.getlist('genres')
-      artist.image_link = request.form['image_link']
-      artist.facebook_link = request.form['facebook_link']
-      artist.website = request.form['website']
-      artist.seeking_venue = True if 'seeking_venue' in request.form else False 
-      artist.seeking_description = request.form['seeking_description']
-      db.session.commit()
+      changes = changed_values(artist_form_values())
+      if changes:
+        updated = update_versioned(Artist, artist_id, request.form.get('version', type=int), changes,
+                                   related_ids(Show.venue_id, Show.artist_id, Artist.id).label('venue_ids'))
+        db.session.commit()
   except:
       db.session.rollback()
       error = True
@@ -385,13 +761,19 @@ def edit_artist_submission(artist_id):
   if error:
       flash('An error occurred. Artist ' + request.form['name'] + ' could not be updated.')
       print(sys.exc_info())
+  elif changes and updated is None:
+      flash('Artist ' + request.form['name'] + ' was changed by someone else since you opened it, '
+            'your changes were not saved. Please review the current values and edit again.')
+      return redirect(url_for('main.edit_artist', artist_id=artist_id))
   else:
     # on successful db insert, flash success
+      if updated:
+        invalidate_pages(*artist_page_tags(artist_id, updated.venue_ids))
       flash('Artist ' + request.form['name'] + ' was successfully updated!')
 
-  return redirect(url_for('show_artist', artist_id=artist_id))
+  return redirect(url_for('main.show_artist', artist_id=artist_id))
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
   form = VenueForm()
   venue = Venue.query.get(venue_id)
@@ -409,32 +791,28 @@ def edit_venue(venue_id):
     "facebook_link": venue.facebook_link,
     "seeking_talent": venue.seeking_talent,
     "seeking_description": venue.seeking_description,
-    "image_link": venue.image_link
+    "image_link": venue.image_link,
+    "version": venue.version
   }
+  data['original'] = original_values(data, VENUE_FIELDS)
 
   # TODO: populate form with values from venue with ID <venue_id> --- DONE
   return render_template('forms/edit_venue.html', form=form, venue=data)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
   # TODO: take values from the form submitted, and update existing --- DONE
   # venue record with ID <venue_id> using the new attributes
   error = False
-  venue = Venue.query.get(venue_id)
+  updated = None
+  changes = None
   try:
     #Updated edit_venue.html file to get with default/current values, in order to avoid lost of data when updating
-      venue.name = request.form['name']
-      venue.city = request.form['city']
-      venue.state = request.form['state']
-      venue.address = request.form['address']
-      venue.phone = request.form['phone']
-      venue.genres = request.form.getlist('genres')
-      venue.image_link = request.form['image_link']
-      venue.facebook_link = request.form['facebook_link']
-      venue.website = request.form['website']
-      venue.seeking_talent = True if 'seeking_talent' in request.form else False 
-      venue.seeking_description = request.form['seeking_description']
-      db.session.commit()
+      changes = changed_values(venue_form_values())
+      if changes:
+        updated = update_versioned(Venue, venue_id, request.form.get('version', type=int), changes,
+                                   related_ids(Show.artist_id, Show.venue_id, Venue.id).label('artist_ids'))
+        db.session.commit()
   except:
       db.session.rollback()
       error = True
@@ -446,20 +824,26 @@ def edit_venue_submission(venue_id):
   if error:
       flash('An error occurred. Venue ' + request.form['name']  + ' could not be updated.')
       print(sys.exc_info())
+  elif changes and updated is None:
+      flash('Venue ' + request.form['name'] + ' was changed by someone else since you opened it, '
+            'your changes were not saved. Please review the current values and edit again.')
+      return redirect(url_for('main.edit_venue', venue_id=venue_id))
   else:
     # on successful db insert, flash success
+      if updated:
+        invalidate_pages(*venue_page_tags(venue_id, updated.artist_ids))
       flash('Venue ' + request.form['name'] + ' was successfully updated!')
-  return redirect(url_for('show_venue', venue_id=venue_id))
+  return redirect(url_for('main.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@bp.route('/artists/create', methods=['GET'])
 def create_artist_form():
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@bp.route('/artists/create', methods=['POST'])
 def create_artist_submission():
   # called upon submitting the new artist listing form
   # TODO: insert form data as a new Artist record in the db, instead --- DONE
@@ -490,6 +874,7 @@ def create_artist_submission():
       print(sys.exc_info())
   else:
     # on successful db insert, flash success
+      invalidate_pages('artists')
       flash('Artist ' + request.form['name'] + ' was successfully listed!')
   return render_template('pages/home.html')
 
@@ -497,48 +882,81 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@bp.route('/shows')
+@read_replica
+@cached_page('shows')
 def shows():
   # displays list of shows at /shows
   # TODO: replace with real venues data. --- DONE
   #       num_shows should be aggregated based on number of upcoming shows per venue.
-  shows = Show.query.join(Artist).join(Venue).all()
-  data = []
-
-  for show in shows:
-    data.append({
-        "venue_id": show.venue_id,
-        "venue_name": show.venue.name,
-        "artist_id": show.artist_id,
-        "artist_name": show.artist.name,
-        "artist_image_link": show.artist.image_link,
-        "start_time": format_datetime(str(show.start_time))
-    })
-  return render_template('pages/shows.html', shows=data)
+  response = not_modified(shows_last_modified())
+  if response:
+    return response
+
+  # the joined artist and venue populate show.artist/show.venue, so the page is one query
+  query = Show.query.join(Artist).join(Venue).options(db.contains_eager(Show.artist), db.contains_eager(Show.venue))
+  keys = (Show.start_time, Show.id)
+
+  if current_app.config['STREAM_SHOWS']:
+    # rows go from the cursor to the client as the template renders them,
+    # memory stays flat whatever the page size
+    shows = StreamedPage(query, keys, lambda show: show_listing_row(show, format_datetime(show.start_time, 'full')))
+    return Response(stream_with_context(stream_template('pages/shows.html', shows=shows)))
+
+  shows, next_page = keyset_page(query, keys)
+
+  # the whole page of start times is formatted in one batch
+  start_times = format_datetimes([show.start_time for show in shows], 'full')
+  data = [show_listing_row(show, start_time) for show, start_time in zip(shows, start_times)]
+  return render_template('pages/shows.html', shows=data, next_page=next_page)
+
+def show_listing_row(show, start_time):
+  return {
+    "venue_id": show.venue_id,
+    "venue_name": show.venue.name,
+    "artist_id": show.artist_id,
+    "artist_name": show.artist.name,
+    "artist_image_link": show.artist.image_link,
+    "start_time": start_time
+  }
 
-@app.route('/shows/create')
+@bp.route('/shows/create')
 def create_shows():
   # renders form. do not touch.
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
+@bp.route('/shows/create', methods=['POST'])
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
   # TODO: insert form data as a new Show record in the db, instead --- DONE
   error = False
+  conflict = None
   try:
+    start_time = parse_datetime(request.form.get('start_time'))
     show = Show(artist_id=request.form.get('artist_id'),
     venue_id=request.form.get('venue_id'),
-    start_time=request.form.get('start_time'))
+    start_time=start_time,
+    duration=int(request.form.get('duration') or DEFAULT_SHOW_DURATION),
+    past=start_time <= datetime.now())
     db.session.add(show)
+    # the insert itself is rejected if the venue or the artist is already
+    # booked at that time
+    db.session.flush()
+    count_shows([Show.id == show.id])
     db.session.commit()
+  except IntegrityError as e:
+    db.session.rollback()
+    error = True
+    conflict = booking_conflict(e)
   except:
     db.session.rollback()
     error = True
   finally:
     db.session.close()
-  if error:
+  if conflict:
+    flash(f'The {conflict} already has a show booked at that time. Show could not be listed.')
+  elif error:
   # TODO: on unsuccessful db insert, flash an error instead. --- DONE
   # e.g., flash('An error occurred. Show could not be listed.')
   # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
@@ -546,28 +964,231 @@ def create_show_submission():
     flash('An error occurred. Show could not be listed.')
   else:
   # on successful db insert, flash success
+    invalidate_pages('shows', 'venues', 'venue:' + request.form['venue_id'], 'artist:' + request.form['artist_id'])
     flash('Show was successfully listed!')
 
   return render_template('pages/home.html')
 
-@app.errorhandler(404)
+@bp.route('/shows/batch')
+def create_shows_batch():
+  return render_template('forms/new_shows.html', shows='', results=None)
+
+@bp.route('/shows/batch', methods=['POST'])
+def create_shows_batch_submission():
+  # schedules a whole tour in one transaction, all of it or nothing; takes
+  # JSON {"shows": [{"artist_id", "venue_id", "start_time", "duration"}, ...]}
+  # or a form with one "artist_id, venue_id, start_time[, duration]" per line
+  from importer import schedule_shows
+
+  if request.is_json:
+    rows = (request.get_json(silent=True) or {}).get('shows')
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+      abort(400)
+  else:
+    fields = ('artist_id', 'venue_id', 'start_time', 'duration')
+    lines = [line for line in request.form.get('shows', '').splitlines() if line.strip()]
+    rows = [dict(zip(fields, (value.strip() for value in values))) for values in csv.reader(lines)]
+
+  results = schedule_shows(rows)
+  created = [row for row, result in zip(rows, results) if result['id'] is not None]
+  if created:
+    invalidate_pages('shows', 'venues',
+                     *{f'venue:{row["venue_id"]}' for row in created},
+                     *{f'artist:{row["artist_id"]}' for row in created})
+
+  if request.is_json:
+    return {'created': len(created), 'results': results}, 201 if created else 422
+  if created:
+    flash(f'{len(created)} shows were successfully listed!')
+  else:
+    flash('Shows could not be listed, no show was created.')
+  return render_template('forms/new_shows.html', shows=request.form.get('shows', ''),
+                         results=None if created else results)
+
+#  Status
+#  ----------------------------------------------------------------
+
+@bp.route('/status/pool')
+def pool_status():
+  # this worker's database connection pool: size, connections checked out
+  # and in, overflow, checkouts, timeouts and time spent waiting for one;
+  # the replica's pool under 'replica' when there is one
+  stats = pool_stats(db.engine.pool)
+  if current_app.config['SQLALCHEMY_BINDS'].get('replica'):
+    stats['replica'] = pool_stats(db.get_engine(current_app, bind='replica').pool)
+  return stats
+
+def runtime_metrics():
+  # this worker's pool and page cache numbers, as (type, help, value) for /metrics
+  values = {}
+  binds = [('db_pool', db.engine)]
+  if current_app.config['SQLALCHEMY_BINDS'].get('replica'):
+    binds.append(('db_replica_pool', db.get_engine(current_app, bind='replica')))
+  for prefix, engine in binds:
+    stats = pool_stats(engine.pool)
+    if not stats['pooled']:
+      continue
+    values[f'{prefix}_size'] = ('gauge', 'Connections kept open by the pools.', stats['size'])
+    values[f'{prefix}_checked_out'] = ('gauge', 'Connections in use.', stats['checked_out'])
+    values[f'{prefix}_overflow'] = ('gauge', 'Connections opened beyond the pool sizes.', max(stats['overflow'], 0))
+    values[f'{prefix}_checkouts_total'] = ('counter', 'Connections handed out.', stats.get('checkouts', 0))
+    values[f'{prefix}_timeouts_total'] = ('counter', 'Requests that gave up waiting for a connection.', stats.get('timeouts', 0))
+    values[f'{prefix}_wait_seconds_total'] = ('counter', 'Time spent waiting for a connection.', stats.get('wait_seconds', 0))
+  page_cache = current_app.extensions['page_cache']
+  if page_cache is not None:
+    values['page_cache_hits_total'] = ('counter', 'Pages served from the page cache.', page_cache.hits)
+    values['page_cache_misses_total'] = ('counter', 'Cacheable pages that had to be rendered.', page_cache.misses)
+  return values
+
+@bp.route('/metrics')
+def metrics_endpoint():
+  # Prometheus text format, added up over all the workers (see metrics.py)
+  return Response(current_app.extensions['metrics'].render(), mimetype='text/plain; version=0.0.4')
+
+#  Export
+#  ----------------------------------------------------------------
+
+@bp.route('/export/<any(venues, artists, shows):kind>')
+@read_replica
+def export(kind):
+  # streams a whole table as ?format=jsonl (default) or csv, optionally
+  # gzipped (?gzip=1) and filtered by ?since= (updated at or after) or, for
+  # shows, ?start= / ?end= (start time range), timestamps in ISO 8601
+  from exporter import export_data, FORMATS
+
+  format = request.args.get('format', 'jsonl')
+  compress = request.args.get('gzip', type=int, default=0) == 1
+  filters = {}
+  try:
+    for name in ('since', 'start', 'end') if kind == 'shows' else ('since',):
+      if request.args.get(name):
+        filters[name] = datetime.fromisoformat(request.args[name])
+  except ValueError:
+    abort(400)
+  if format not in FORMATS:
+    abort(400)
+
+  filename = f'{kind}.{format}' + ('.gz' if compress else '')
+  mimetype = 'application/gzip' if compress else ('text/csv' if format == 'csv' else 'application/x-ndjson')
+  return Response(
+    stream_with_context(export_data(kind, format, compress, **filters)),
+    mimetype=mimetype,
+    headers={'Content-Disposition': f'attachment; filename={filename}'}
+  )
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@bp.cli.command('import-data')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per INSERT and transaction.')
+def import_data_command(kind, path, batch_size):
+  """Import venues, artists or shows from a .csv or .jsonl file."""
+  # rows are validated with the VenueForm/ArtistForm/ShowForm rules; shows
+  # take a start_time as 'YYYY-MM-DD HH:MM:SS' or ISO 8601
+  from importer import import_rows
+
+  start = time.perf_counter()
+  report = import_rows(kind, path, batch_size)
+  elapsed = time.perf_counter() - start
+  for line, message in report.errors:
+    print(f'{path}:{line}: {message}', file=sys.stderr)
+  # listings change right away, detail pages of shows' venues and artists
+  # expire with their TTL
+  if kind == 'shows':
+    invalidate_pages('shows', 'venues')
+  else:
+    invalidate_pages(kind)
+  rows = report.imported + len(report.errors)
+  print(f'{report.imported} {kind} imported, {len(report.errors)} rejected, '
+        f'{elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)')
+
+@bp.cli.command('generate-data')
+@click.option('--venues', default=1000, show_default=True, help='Venues to add.')
+@click.option('--artists', default=1000, show_default=True, help='Artists to add.')
+@click.option('--shows', default=10000, show_default=True, help='Shows to book between the new venues and artists.')
+@click.option('--areas', default=200, show_default=True, help='City/state areas to spread them over.')
+@click.option('--past-days', default=365, show_default=True, help='Days before today the shows start from.')
+@click.option('--future-days', default=180, show_default=True, help='Days after today the shows go up to.')
+@click.option('--today', type=click.DateTime(['%Y-%m-%d']), help='Day the show dates are relative to, the current one by default.')
+@click.option('--seed', default=0, show_default=True, help='Random seed, the same seed (and day) gives the same data.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per INSERT and transaction.')
+def generate_data_command(venues, artists, shows, areas, past_days, future_days, today, seed, batch_size):
+  """Add synthetic venues, artists and shows, for scale and load tests."""
+  from generator import generate_data
+
+  start = time.perf_counter()
+  report = generate_data(venues, artists, shows, seed=seed, areas=areas, past_days=past_days,
+                         future_days=future_days, today=today, batch_size=batch_size)
+  elapsed = time.perf_counter() - start
+  invalidate_pages('venues', 'artists', 'shows')
+  rows = report.venues + report.artists + report.shows
+  print(f'{report.venues} venues, {report.artists} artists and {report.shows} shows generated, '
+        f'{report.skipped} shows skipped (no free slot), {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)')
+
+@bp.cli.command('export-data')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'format', type=click.Choice(['jsonl', 'csv']), default='jsonl', show_default=True)
+@click.option('--since', type=click.DateTime(), help='Only rows updated at or after this time.')
+@click.option('--start', type=click.DateTime(), help='Only shows starting at or after this time.')
+@click.option('--end', type=click.DateTime(), help='Only shows starting before this time.')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), help='File to write, stdout by default.')
+def export_data_command(kind, format, since, start, end, compress, output):
+  """Export venues, artists or shows as JSON lines or CSV."""
+  from exporter import export_data
+
+  if kind != 'shows' and (start or end):
+    raise click.BadParameter('--start/--end only apply to shows')
+  chunks = export_data(kind, format, compress, since=since, start=start, end=end)
+  if output:
+    file = open(output, 'wb' if compress else 'w', newline=None if compress else '')
+  else:
+    file = click.get_binary_stream('stdout') if compress else click.get_text_stream('stdout')
+  try:
+    for chunk in chunks:
+      file.write(chunk)
+  finally:
+    if output:
+      file.close()
+
+@bp.cli.command('rollover-shows')
+def rollover_shows_command():
+  """Move shows that have started from the upcoming to the past counters."""
+  # meant to be run periodically (e.g. every minute from cron)
+  moved = rollover_shows(datetime.now())
+  db.session.commit()
+  if moved:
+    # the listings and pages of the shows' venues and artists count them
+    invalidate_pages('venues', 'shows',
+                     *{f'venue:{venue_id}' for venue_id, _ in moved}, *{f'artist:{artist_id}' for _, artist_id in moved})
+  print(f'{len(moved)} show(s) moved from upcoming to past')
+
+@bp.cli.command('audit-bookings')
+def audit_bookings_command():
+  """List venues and artists booked for overlapping shows."""
+  # exits with status 1 when any are found, e.g. before upgrading to the
+  # booking constraints
+  found = 0
+  for side, key in (('venue', Show.venue_id), ('artist', Show.artist_id)):
+    for id, show_id, slot, other_id, other_slot in overlapping_shows(key):
+      found += 1
+      print(f'{side} {id}: show {show_id} ({slot.lower} - {slot.upper}) '
+            f'overlaps show {other_id} ({other_slot.lower} - {other_slot.upper})')
+  print(f'{found} overlapping booking(s)')
+  if found:
+    sys.exit(1)
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -575,11 +1196,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,50 @@
+#----------------------------------------------------------------------------#
+# Micro-benchmark: app.format_datetime against the original implementation.
+#
+#   python -m benchmarks.format_datetime [rows]
+#----------------------------------------------------------------------------#
+
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import format_datetime, format_datetimes
+
+
+def original_format_datetime(value, format='medium'):
+  # format_datetime as it was before the fast path: parse the string back,
+  # resolve the pattern on every call
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format)
+
+
+def main(rows=1000, repeat=5):
+  start = datetime(2021, 1, 1, 20, 0)
+  values = [start + timedelta(hours=i) for i in range(rows)]
+
+  cases = {
+    # what the routes used to do: str() the value, format it, then format the
+    # result again from the template filter
+    'original (route + filter)': lambda: [original_format_datetime(original_format_datetime(str(value)), 'full') for value in values],
+    'original (single call)': lambda: [original_format_datetime(str(value), 'full') for value in values],
+    'format_datetime': lambda: [format_datetime(value, 'full') for value in values],
+    'format_datetimes (batch)': lambda: format_datetimes(values, 'full'),
+  }
+
+  assert cases['format_datetimes (batch)']() == cases['original (single call)']()
+
+  print(f'{rows} timestamps, best of {repeat}')
+  for name, case in cases.items():
+    best = min(timeit.repeat(case, number=1, repeat=repeat))
+    print(f'  {name:<28} {best * 1000:9.2f} ms  {best / rows * 1e6:8.2f} us/row')
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,266 @@
+#----------------------------------------------------------------------------#
+# Load test: a mixed workload replayed against a running instance.
+#
+# N client threads send requests for --duration seconds, each picking its
+# next route at random with the weights of --mix: the listings, venue and
+# artist pages, searches and show creation (which writes to the database of
+# the instance, give it a weight of 0 to keep it read-only). Venue and artist
+# ids are taken from the first page of the listings. Every --interval
+# seconds the throughput, latency percentiles and errors of the interval are
+# printed, then the totals per route; --output saves them as JSON.
+#
+# Only needs the standard library. Point it at a server started as usual
+# (e.g. gunicorn 'app:create_app()'), or pass --serve to start the app's own
+# threaded server in a child process for the run.
+#
+#   python -m benchmarks.load [--url http://127.0.0.1:5000] [--clients 8] [--duration 30]
+#     [--mix venue=4,artist=4,venues=2,...] [--serve] [-o FILE]
+#----------------------------------------------------------------------------#
+
+import argparse
+import http.client
+import json
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+
+DEFAULT_MIX = 'venues=2,artists=2,shows=2,venue=4,artist=4,search_venues=1,search_artists=1,create_show=1'
+SEARCH_TERMS = ['Hop', 'Hall', 'Velvet', 'Tavern', 'Music', 'Petals', 'Band', 'Wild', 'Trio', 'Neon']
+
+
+#  Workload
+#  ----------------------------------------------------------------
+
+def discover_ids(connection, path):
+  # ids linked from the first page of a listing
+  connection.request('GET', path)
+  response = connection.getresponse()
+  page = response.read().decode()
+  ids = sorted({int(id) for id in re.findall(rf'href="{path}/(\d+)"', page)})
+  if not ids:
+    sys.exit(f'no ids found on {path} (status {response.status}), is the database seeded?')
+  return ids
+
+def workload(venue_ids, artist_ids):
+  # route name -> function(rng) returning (method, path, form data or None)
+  def create_show(rng):
+    # a random minute of a far-off year, so bookings rarely collide
+    start_time = datetime(2200, 1, 1) + timedelta(minutes=rng.randrange(60 * 24 * 365 * 50))
+    return 'POST', '/shows/create', {'venue_id': rng.choice(venue_ids), 'artist_id': rng.choice(artist_ids),
+                                     'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')}
+
+  return {
+    'venues': lambda rng: ('GET', '/venues', None),
+    'artists': lambda rng: ('GET', '/artists', None),
+    'shows': lambda rng: ('GET', '/shows', None),
+    'venue': lambda rng: ('GET', f'/venues/{rng.choice(venue_ids)}', None),
+    'artist': lambda rng: ('GET', f'/artists/{rng.choice(artist_ids)}', None),
+    'search_venues': lambda rng: ('POST', '/venues/search', {'search_term': rng.choice(SEARCH_TERMS)}),
+    'search_artists': lambda rng: ('POST', '/artists/search', {'search_term': rng.choice(SEARCH_TERMS)}),
+    'create_show': create_show,
+  }
+
+def parse_mix(value, routes):
+  mix = {}
+  for item in value.split(','):
+    name, _, weight = item.partition('=')
+    if name.strip() not in routes:
+      raise argparse.ArgumentTypeError(f"unknown route {name.strip()!r}, choose from {', '.join(routes)}")
+    mix[name.strip()] = float(weight or 1)
+  if not any(mix.values()):
+    raise argparse.ArgumentTypeError('the mix needs at least one route with a weight above 0')
+  return mix
+
+
+#  Clients
+#  ----------------------------------------------------------------
+
+class Recorder:
+  # (finished at, route, latency in ms, status or None on error) of every
+  # request, shared by the client threads
+  def __init__(self):
+    self.records = []
+    self.lock = threading.Lock()
+
+  def add(self, record):
+    with self.lock:
+      self.records.append(record)
+
+  def since(self, start):
+    with self.lock:
+      return self.records[start:], len(self.records)
+
+
+def client(host, port, routes, mix, seed, recorder, stop):
+  # one keep-alive connection, reopened whenever the server closes it
+  rng = random.Random(seed)
+  names, weights = list(mix), list(mix.values())
+  connection = http.client.HTTPConnection(host, port, timeout=30)
+  while not stop.is_set():
+    name = rng.choices(names, weights)[0]
+    method, path, data = routes[name](rng)
+    body = urllib.parse.urlencode(data) if data is not None else None
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if data is not None else {}
+    start = time.perf_counter()
+    try:
+      connection.request(method, path, body, headers)
+      response = connection.getresponse()
+      response.read()
+      status = response.status
+    except (OSError, http.client.HTTPException):
+      connection.close()
+      status = None
+    recorder.add((time.monotonic(), name, (time.perf_counter() - start) * 1000, status))
+  connection.close()
+
+
+#  Reporting
+#  ----------------------------------------------------------------
+
+def percentile(values, percent):
+  # nearest rank
+  ordered = sorted(values)
+  return ordered[max(0, -(-len(ordered) * percent // 100) - 1)]
+
+def summary(records, seconds):
+  latencies = [latency for _, _, latency, _ in records]
+  errors = sum(1 for *_, status in records if status is None or status >= 500)
+  if not latencies:
+    return {'requests': 0, 'rps': 0, 'errors': errors}
+  return {
+    'requests': len(records),
+    'rps': len(records) / seconds,
+    'p50_ms': percentile(latencies, 50),
+    'p95_ms': percentile(latencies, 95),
+    'p99_ms': percentile(latencies, 99),
+    'errors': errors,
+  }
+
+def print_summary(label, result):
+  if not result['requests']:
+    print(f"  {label:<16} no requests completed")
+    return
+  print(f"  {label:<16} {result['rps']:8.1f} req/s  p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+        f"p99 {result['p99_ms']:8.2f} ms  {result['errors']} errors")
+
+
+#  Server
+#  ----------------------------------------------------------------
+
+def serve(port):
+  # the app's own threaded server in a child process, ready once it answers
+  process = subprocess.Popen([
+    sys.executable, '-c',
+    f'from app import create_app; create_app().run(port={port}, threaded=True, debug=False, use_reloader=False)'
+  ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+  for _ in range(100):
+    try:
+      connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+      connection.request('GET', '/')
+      connection.getresponse().read()
+      connection.close()
+      return process
+    except OSError:
+      if process.poll() is not None:
+        sys.exit('the server exited, check that the app starts with `python app.py`')
+      time.sleep(0.1)
+  process.terminate()
+  sys.exit(f'the server did not answer on port {port}')
+
+
+#  Run
+#  ----------------------------------------------------------------
+
+def run(args, host, port, routes, mix):
+  recorder, stop = Recorder(), threading.Event()
+  threads = [
+    threading.Thread(target=client, args=(host, port, routes, mix, args.seed + number, recorder, stop), daemon=True)
+    for number in range(args.clients)
+  ]
+  for thread in threads:
+    thread.start()
+
+  print(f'{args.clients} clients against {args.url}, mix {mix}')
+  time.sleep(args.warmup)
+  _, first = recorder.since(0)
+  start = time.monotonic()
+  position, intervals = first, []
+  while time.monotonic() - start < args.duration:
+    interval_start = time.monotonic()
+    time.sleep(min(args.interval, args.duration - (interval_start - start)))
+    records, position = recorder.since(position)
+    result = summary(records, time.monotonic() - interval_start)
+    result['at_s'] = round(time.monotonic() - start, 1)
+    intervals.append(result)
+    print_summary(f"{result['at_s']:7.1f}s", result)
+  elapsed = time.monotonic() - start
+  stop.set()
+  for thread in threads:
+    thread.join()
+
+  records, _ = recorder.since(first)
+  records = [record for record in records if record[0] <= start + elapsed]
+  total = summary(records, elapsed)
+  by_route = {name: summary([record for record in records if record[1] == name], elapsed) for name, weight in mix.items() if weight}
+  print('per route')
+  for name, result in by_route.items():
+    print_summary(name, result)
+  print_summary('total', total)
+  return {
+    'url': args.url,
+    'clients': args.clients,
+    'duration_s': elapsed,
+    'mix': mix,
+    'total': total,
+    'routes': by_route,
+    'intervals': intervals,
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(prog='python -m benchmarks.load', description='Replays a mixed workload.')
+  parser.add_argument('--url', default='http://127.0.0.1:5000', help='base URL of the instance')
+  parser.add_argument('--clients', type=int, default=8, help='concurrent clients')
+  parser.add_argument('--duration', type=float, default=30, help='seconds to run, after the warm-up')
+  parser.add_argument('--warmup', type=float, default=2, help='seconds of load not counted in the results')
+  parser.add_argument('--interval', type=float, default=5, help='seconds between progress lines')
+  parser.add_argument('--mix', default=DEFAULT_MIX, help=f'route=weight list (default {DEFAULT_MIX})')
+  parser.add_argument('--seed', type=int, default=0, help='random seed of the clients')
+  parser.add_argument('--serve', action='store_true', help="start the app's threaded server on the URL's port")
+  parser.add_argument('-o', '--output', help='JSON results file')
+  args = parser.parse_args()
+
+  try:
+    mix = parse_mix(args.mix, workload([], []))
+  except argparse.ArgumentTypeError as error:
+    parser.error(str(error))
+
+  url = urllib.parse.urlsplit(args.url)
+  host, port = url.hostname, url.port or 80
+  server = serve(port) if args.serve else None
+  try:
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+      routes = workload(discover_ids(connection, '/venues'), discover_ids(connection, '/artists'))
+    except OSError as error:
+      sys.exit(f'cannot reach {args.url}: {error}')
+    connection.close()
+    results = run(args, host, port, routes, mix)
+  finally:
+    if server is not None:
+      server.terminate()
+      server.wait()
+
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump(results, file, indent=2)
+    print(f'results saved to {args.output}')
+
+
+if __name__ == '__main__':
+  main()
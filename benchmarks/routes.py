@@ -0,0 +1,277 @@
+#----------------------------------------------------------------------------#
+# Benchmark: every route of the app, on a database seeded at a given scale.
+#
+# Recreates the tables of the database given with --database (use a scratch
+# one, everything in it is dropped) and seeds it with --scale venues, artists
+# and shows from generator.py, or reuses it as it is with --no-seed. Then drives each route
+# through the test client, with the page cache off: a few warm-up requests,
+# then --requests timed ones. Reports the p50/p95/p99 latency, the SQL
+# statements per request and the peak Python memory allocated by one request
+# (plus the peak RSS of the run), and saves them as JSON together with the
+# commit measured, so that a later run can be compared with --compare.
+#
+#   python -m benchmarks.routes --database postgresql:///fyyur_bench [--scale 10000]
+#     [--requests 50] [--routes REGEX] [--no-seed] [-o FILE] [--compare FILE]
+#----------------------------------------------------------------------------#
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import re
+import resource
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+#  Seeding
+#  ----------------------------------------------------------------
+
+def seed(db, scale):
+  # scale venues, artists and shows from the synthetic data generator
+  # (fixed seed), on freshly created tables
+  from generator import generate_data
+
+  db.drop_all()
+  for extension in ('pg_trgm', 'btree_gist'):
+    db.session.execute(f'CREATE EXTENSION IF NOT EXISTS {extension}')
+  db.session.commit()
+  db.create_all()
+  generate_data(scale, scale, scale, seed=0)
+  db.session.remove()
+
+
+#  Routes
+#  ----------------------------------------------------------------
+
+def venue_form(number):
+  return {'name': f'The Benchmark Hall {number}', 'city': 'San Francisco', 'state': 'CA',
+          'address': '1015 Folsom Street', 'phone': '123-123-1234', 'genres': ['Jazz', 'Folk'],
+          'image_link': '', 'facebook_link': '', 'website': '', 'seeking_description': ''}
+
+def artist_form(number):
+  return {'name': f'The Benchmark Band {number}', 'city': 'San Francisco', 'state': 'CA',
+          'phone': '326-123-5000', 'genres': ['Rock n Roll'],
+          'image_link': '', 'facebook_link': '', 'website': '', 'seeking_description': ''}
+
+def routes(db):
+  # (name, prepare) for every route; prepare returns the (method, url,
+  # keyword arguments) of the next request and does the setup it needs
+  # (e.g. a venue to delete) outside of the measurement
+  from models import Venue, Artist, Show
+
+  # the pages measured are the first venue's and artist's, shows are booked
+  # for a venue and an artist of their own (so those pages keep their size
+  # from one run to the next), 3 hours apart after the last show
+  venue_id = db.session.query(db.func.min(Venue.id)).scalar()
+  artist_id = db.session.query(db.func.min(Artist.id)).scalar()
+  last_show = db.session.query(db.func.max(Show.start_time)).scalar() or datetime.now()
+  db.session.remove()
+  numbers = itertools.count()
+  slots = (last_show + timedelta(days=1, hours=3 * number) for number in itertools.count())
+
+  def version(model, id):
+    value = db.session.query(model.version).filter(model.id == id).scalar()
+    db.session.remove()
+    return value
+
+  def new_venue():
+    venue = Venue(**dict(venue_form(next(numbers)), genres=['Jazz']))
+    db.session.add(venue)
+    db.session.commit()
+    id = venue.id
+    db.session.remove()
+    return id
+
+  def new_artist():
+    artist = Artist(**dict(artist_form(next(numbers)), genres=['Jazz']))
+    db.session.add(artist)
+    db.session.commit()
+    id = artist.id
+    db.session.remove()
+    return id
+
+  booking = {'venue_id': new_venue(), 'artist_id': new_artist()}
+
+  def show_row():
+    return dict(booking, start_time=next(slots).strftime('%Y-%m-%d %H:%M:%S'))
+
+  return [
+    ('index', lambda: ('get', '/', {})),
+    ('venues', lambda: ('get', '/venues', {})),
+    ('search_venues', lambda: ('post', '/venues/search', {'data': {'search_term': 'Hop'}})),
+    ('show_venue', lambda: ('get', f'/venues/{venue_id}', {})),
+    ('create_venue_form', lambda: ('get', '/venues/create', {})),
+    ('create_venue_submission', lambda: ('post', '/venues/create', {'data': venue_form(next(numbers))})),
+    ('delete_venue', lambda: ('delete', f'/venues/{new_venue()}', {})),
+    ('artists', lambda: ('get', '/artists', {})),
+    ('search_artists', lambda: ('post', '/artists/search', {'data': {'search_term': 'Petals'}})),
+    ('show_artist', lambda: ('get', f'/artists/{artist_id}', {})),
+    ('edit_artist', lambda: ('get', f'/artists/{artist_id}/edit', {})),
+    ('edit_artist_submission', lambda: ('post', f'/artists/{artist_id}/edit', {
+      'data': dict(artist_form(next(numbers)), version=version(Artist, artist_id))})),
+    ('edit_venue', lambda: ('get', f'/venues/{venue_id}/edit', {})),
+    ('edit_venue_submission', lambda: ('post', f'/venues/{venue_id}/edit', {
+      'data': dict(venue_form(next(numbers)), version=version(Venue, venue_id))})),
+    ('create_artist_form', lambda: ('get', '/artists/create', {})),
+    ('create_artist_submission', lambda: ('post', '/artists/create', {'data': artist_form(next(numbers))})),
+    ('shows', lambda: ('get', '/shows', {})),
+    ('create_shows', lambda: ('get', '/shows/create', {})),
+    ('create_show_submission', lambda: ('post', '/shows/create', {'data': show_row()})),
+    ('create_shows_batch', lambda: ('get', '/shows/batch', {})),
+    ('create_shows_batch_submission', lambda: ('post', '/shows/batch', {'json': {'shows': [show_row() for _ in range(10)]}})),
+    ('pool_status', lambda: ('get', '/status/pool', {})),
+    ('metrics_endpoint', lambda: ('get', '/metrics', {})),
+    ('export', lambda: ('get', '/export/shows', {})),
+    ('not_found_error', lambda: ('get', '/nowhere', {})),
+  ]
+
+
+#  Measurement
+#  ----------------------------------------------------------------
+
+def percentile(values, percent):
+  # nearest rank
+  ordered = sorted(values)
+  return ordered[max(0, -(-len(ordered) * percent // 100) - 1)]
+
+def measure_route(client, prepare, statements, requests, warmup):
+  timings, counts, statuses = [], [], set()
+
+  def send():
+    method, url, kwargs = prepare()
+    statements.clear()
+    start = time.perf_counter()
+    response = getattr(client, method)(url, buffered=False, **kwargs)
+    # streamed pages run their queries while the body is read, chunks are
+    # dropped as they come so the client does not count in the memory peak
+    for _ in response.response:
+      pass
+    elapsed = time.perf_counter() - start
+    response.close()
+    statuses.add(response.status_code)
+    return elapsed, len(statements)
+
+  for _ in range(warmup):
+    send()
+  for _ in range(requests):
+    elapsed, count = send()
+    timings.append(elapsed * 1000)
+    counts.append(count)
+
+  # allocations are traced on one extra request only, tracing slows them down
+  tracemalloc.start()
+  send()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+
+  return {
+    'p50_ms': percentile(timings, 50),
+    'p95_ms': percentile(timings, 95),
+    'p99_ms': percentile(timings, 99),
+    'mean_ms': sum(timings) / len(timings),
+    'statements': percentile(counts, 50),
+    'max_statements': max(counts),
+    'peak_kb': peak / 1024,
+    'statuses': sorted(statuses),
+  }
+
+def commit():
+  try:
+    return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True, capture_output=True, text=True,
+                          cwd=os.path.dirname(__file__)).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def run(args):
+  from app import create_app
+  from extensions import db
+
+  # the page cache would answer every timed request after the first
+  app = create_app(SQLALCHEMY_DATABASE_URI=args.database, SQLALCHEMY_BINDS={}, CACHE_BACKEND=None, TESTING=True)
+  app.logger.setLevel(logging.ERROR)
+  statements = []
+
+  with app.app_context():
+    if args.seed:
+      start = time.perf_counter()
+      seed(db, args.scale)
+      print(f'seeded {args.scale} venues, artists and shows in {time.perf_counter() - start:.1f} s')
+    scale = {model: db.session.execute(f'SELECT count(*) FROM "{model}"').scalar() for model in ('Venue', 'Artist', 'Show')}
+    db.session.remove()
+    event.listen(db.engine, 'before_cursor_execute', lambda *_: statements.append(None))
+
+    client = app.test_client()
+    results = {}
+    for name, prepare in routes(db):
+      if args.routes and not re.search(args.routes, name):
+        continue
+      results[name] = measure_route(client, prepare, statements, args.requests, args.warmup)
+      print_result(name, results[name])
+
+  return {
+    'commit': commit(),
+    'date': datetime.now().isoformat(timespec='seconds'),
+    'python': platform.python_version(),
+    'scale': scale,
+    'requests': args.requests,
+    # kilobytes on Linux
+    'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'routes': results,
+  }
+
+
+#  Reporting
+#  ----------------------------------------------------------------
+
+def print_result(name, result):
+  failed = '' if all(status < 500 for status in result['statuses']) else f"  status {result['statuses']}"
+  print(f"  {name:<30} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+        f"{result['statements']:4} stmts  {result['peak_kb']:9.1f} KB{failed}")
+
+def compare(baseline, current):
+  print(f"against {baseline['commit']} ({baseline['date']}, scale {baseline['scale']})")
+  for name, result in current['routes'].items():
+    before = baseline['routes'].get(name)
+    if before is None:
+      continue
+    changes = '  '.join(
+      f"{key[:-3]} {(result[key] - before[key]) / before[key] * 100:+6.1f}%" if before[key] else f'{key[:-3]}      -'
+      for key in ('p50_ms', 'p95_ms', 'p99_ms')
+    )
+    print(f"  {name:<30} {changes}  stmts {before['statements']} -> {result['statements']}")
+
+def main():
+  parser = argparse.ArgumentParser(prog='python -m benchmarks.routes', description='Benchmarks every route of the app.')
+  parser.add_argument('--database', required=True, help='database URL, its tables are dropped and seeded again')
+  parser.add_argument('--scale', type=int, default=10000, help='venues, artists and shows to seed')
+  parser.add_argument('--no-seed', dest='seed', action='store_false', help='benchmark the data already there')
+  parser.add_argument('--requests', type=int, default=50, help='timed requests per route')
+  parser.add_argument('--warmup', type=int, default=3, help='untimed requests per route first')
+  parser.add_argument('--routes', help='only the routes whose name matches this regular expression')
+  parser.add_argument('-o', '--output', help='JSON results file (default benchmarks/results/routes-<commit>-<scale>.json)')
+  parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+  args = parser.parse_args()
+
+  results = run(args)
+  output = args.output or os.path.join(RESULTS_DIR, f"routes-{results['commit'] or 'unknown'}-{results['scale']['Venue']}.json")
+  os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+  with open(output, 'w') as file:
+    json.dump(results, file, indent=2)
+  print(f"peak rss {results['peak_rss_mb']:.1f} MB, results saved to {output}")
+
+  if args.compare:
+    with open(args.compare) as file:
+      compare(json.load(file), results)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,61 @@
+#----------------------------------------------------------------------------#
+# Benchmark: buffered against streamed rendering of the /shows listing.
+#
+# Renders one /shows page of the given size from the configured database in
+# each mode, each in a fresh process, and reports the time to first byte, the
+# total time and the peak RSS of the process.
+#
+#   python -m benchmarks.shows_streaming [rows]
+#----------------------------------------------------------------------------#
+
+import json
+import resource
+import subprocess
+import sys
+import time
+
+
+def measure(mode, rows):
+  from app import create_app
+
+  app = create_app(STREAM_SHOWS=mode == 'streamed', MAX_PAGE_SIZE=rows, CACHE_BACKEND=None)
+  client = app.test_client()
+
+  start = time.perf_counter()
+  response = client.get(f'/shows?per_page={rows}', buffered=False)
+  chunks = iter(response.response)
+  size = len(next(chunks))
+  first_byte = time.perf_counter() - start
+  for chunk in chunks:
+    size += len(chunk)
+  response.close()
+  total = time.perf_counter() - start
+
+  return {
+    'mode': mode,
+    'rows': rows,
+    'bytes': size,
+    'ttfb_ms': first_byte * 1000,
+    'total_ms': total * 1000,
+    # kilobytes on Linux
+    'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+  }
+
+
+def main(rows=10000):
+  print(f'/shows?per_page={rows}')
+  for mode in ('buffered', 'streamed'):
+    output = subprocess.run(
+      [sys.executable, '-m', 'benchmarks.shows_streaming', '--measure', mode, str(rows)],
+      check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    print(f"  {mode:<9} ttfb {result['ttfb_ms']:9.1f} ms  total {result['total_ms']:9.1f} ms  "
+          f"peak rss {result['peak_rss_mb']:7.1f} MB  ({result['bytes']} bytes)")
+
+
+if __name__ == '__main__':
+  if sys.argv[1:2] == ['--measure']:
+    print(json.dumps(measure(sys.argv[2], int(sys.argv[3]))))
+  else:
+    main(*[int(arg) for arg in sys.argv[1:2]])
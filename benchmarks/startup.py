@@ -0,0 +1,60 @@
+#----------------------------------------------------------------------------#
+# Benchmark: process startup, as paid by every worker, CLI and test run.
+#
+# In fresh processes, times importing the app module, building the app with
+# create_app() and serving the first request (the home page, which needs no
+# database, and /venues, which opens the first connection), and counts the
+# modules loaded. Reports the median of the runs.
+#
+#   python -m benchmarks.startup [runs]
+#----------------------------------------------------------------------------#
+
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+def measure():
+  start = time.perf_counter()
+  import app
+  imported = time.perf_counter()
+  application = app.create_app(CACHE_BACKEND=None)
+  created = time.perf_counter()
+  client = application.test_client()
+  client.get('/')
+  first_request = time.perf_counter()
+  client.get('/venues')
+  first_query = time.perf_counter()
+
+  return {
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first_request - created) * 1000,
+    'first_db_request_ms': (first_query - first_request) * 1000,
+    'total_ms': (first_query - start) * 1000,
+    'modules': len(sys.modules),
+  }
+
+
+def main(runs=10):
+  results = []
+  for _ in range(runs):
+    output = subprocess.run(
+      [sys.executable, '-m', 'benchmarks.startup', '--measure'],
+      check=True, capture_output=True, text=True
+    ).stdout
+    results.append(json.loads(output.strip().splitlines()[-1]))
+
+  print(f'startup, median of {runs} processes')
+  for name in ('import_ms', 'create_app_ms', 'first_request_ms', 'first_db_request_ms', 'total_ms'):
+    print(f'  {name[:-3]:<18} {statistics.median(result[name] for result in results):9.1f} ms')
+  print(f"  {'modules':<18} {statistics.median(result['modules'] for result in results):9.0f}")
+
+
+if __name__ == '__main__':
+  if sys.argv[1:2] == ['--measure']:
+    print(json.dumps(measure()))
+  else:
+    main(*[int(arg) for arg in sys.argv[1:2]])
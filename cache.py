@@ -0,0 +1,149 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# Rendered pages are cached under a key (route + arguments) together with the
+# generation of every tag they depend on, e.g. 'venue:3' or 'shows'. Writes
+# invalidate tags by bumping their generation, which makes every page stored
+# under an older generation a miss, wherever it lives.
+
+class MemoryBackend:
+    # in-process LRU bounded by max_entries, entries expire after their ttl;
+    # each worker process has its own copy, which only its own writes
+    # invalidate, so it only suits a single process
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.tag_generations = {}
+        self.tag_bumped = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def generations(self, tags):
+        with self.lock:
+            return [self.tag_generations.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self.lock:
+            now = time.time()
+            for tag in tags:
+                self.tag_generations[tag] = self.tag_generations.get(tag, 0) + 1
+                self.tag_bumped[tag] = now
+
+    def last_bumped(self, tags):
+        with self.lock:
+            return max((self.tag_bumped.get(tag, 0) for tag in tags), default=0)
+
+
+class SharedBackend:
+    # stores entries in a shared key/value server so every worker sees the
+    # same pages and invalidations; client is anything with the redis-py
+    # get/set/mget/incr methods (a redis.Redis, or a local stand-in)
+    def __init__(self, client, prefix='fyyur:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url):
+        import redis
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def generations(self, tags):
+        if not tags:
+            return []
+        values = self.client.mget([self.prefix + 'gen:' + tag for tag in tags])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tags):
+        now = repr(time.time())
+        for tag in tags:
+            self.client.incr(self.prefix + 'gen:' + tag)
+            self.client.set(self.prefix + 'bumped:' + tag, now)
+
+    def last_bumped(self, tags):
+        if not tags:
+            return 0
+        values = self.client.mget([self.prefix + 'bumped:' + tag for tag in tags])
+        return max(float(value or 0) for value in values)
+
+
+class PageCache:
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+        # lookups answered by this process, for /metrics (counted under lock,
+        # the threads of a worker share them)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        # CACHE_BACKEND is 'memory', 'shared' (server at CACHE_URL) or None
+        backend = config.get('CACHE_BACKEND')
+        if not backend:
+            return None
+        if backend == 'shared':
+            return cls(SharedBackend.from_url(config['CACHE_URL']), config['CACHE_TTL'])
+        return cls(MemoryBackend(config['CACHE_MAX_ENTRIES']), config['CACHE_TTL'])
+
+    def lookup(self, key, tags):
+        # returns (value or None, generations); on a miss the generations are
+        # captured before the page is built, so a write that happens while it
+        # renders leaves the stored copy already stale
+        generations = self.backend.generations(tags)
+        entry = self.backend.get(key)
+        if entry is not None and entry[0] == generations:
+            with self.lock:
+                self.hits += 1
+            return entry[1], generations
+        with self.lock:
+            self.misses += 1
+        return None, generations
+
+    def store(self, key, value, generations, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl > 0:
+            self.backend.set(key, (generations, value), ttl)
+
+    def invalidate(self, *tags):
+        self.backend.bump(tags)
+
+    def changed_within(self, tags, seconds):
+        # whether any of the tags was invalidated in the last seconds, e.g.
+        # by a write a lagging replica may not have caught up with yet
+        return self.backend.last_bumped(tags) > time.time() - seconds
@@ -0,0 +1,85 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from extensions import db
+from models import Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+
+# Tables are exported row by row from a server-side cursor, serialized and
+# optionally gzipped as they stream, so memory stays flat whatever their
+# size. The output can be loaded back with the import-data command.
+
+MODELS = {
+    'venues': Venue,
+    'artists': Artist,
+    'shows': Show,
+}
+
+FORMATS = ('jsonl', 'csv')
+
+def export_rows(kind, since=None, start=None, end=None, batch_size=1000):
+    # yields the rows of a table as dicts, in id order; since keeps the rows
+    # updated at or after it, start/end the shows starting in [start, end)
+    model = MODELS[kind]
+    # computed columns (Show.slot) are derived again on import
+    columns = [column for column in model.__table__.columns if column.computed is None]
+    query = db.session.query(*columns)
+    if since is not None:
+        query = query.filter(model.updated_at >= since)
+    if start is not None:
+        query = query.filter(Show.start_time >= start)
+    if end is not None:
+        query = query.filter(Show.start_time < end)
+    for row in query.order_by(model.id).yield_per(batch_size):
+        yield dict(zip((column.name for column in columns), row))
+
+def as_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps({name: as_value(value) for name, value in row.items()}) + '\n'
+
+def csv_lines(rows, batch_size=1000):
+    # genres are written as a comma separated cell
+    buffer = io.StringIO()
+    writer = None
+    for count, row in enumerate(rows, 1):
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow({
+            name: ', '.join(value) if isinstance(value, list) else as_value(value)
+            for name, value in row.items()
+        })
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def gzipped(chunks):
+    # gzip stream compressed on the fly, one chunk at a time
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_data(kind, format='jsonl', compress=False, **filters):
+    # iterates the serialized export, as str chunks or gzipped bytes
+    rows = export_rows(kind, **filters)
+    chunks = csv_lines(rows) if format == 'csv' else jsonl_lines(rows)
+    return gzipped(chunks) if compress else chunks
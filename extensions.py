@@ -0,0 +1,47 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import sys
+
+from flask import g, has_app_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+
+#----------------------------------------------------------------------------#
+# Extensions.
+#----------------------------------------------------------------------------#
+
+# Created unbound and initialized on each application by create_app, so the
+# models and helper modules import them without importing (or building) the
+# app itself.
+
+class RoutingSession(SignallingSession):
+    # sends every statement to the 'replica' bind while g.read_replica is set
+    # (see app.read_replica) and the bind is configured, to the primary
+    # otherwise; flushes always go to the primary
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if (not self._flushing and has_app_context() and g.get('read_replica')
+                and 'replica' in self.app.config['SQLALCHEMY_BINDS']):
+            return self.db.get_engine(self.app, bind='replica')
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+db = RoutingSQLAlchemy()
+
+def init_migrate(app):
+    # Flask-Migrate pulls in Alembic, which only the `flask db` commands use.
+    # The flask CLI has imported it by the time any command runs; workers and
+    # tests never do, and skip it.
+    if 'flask_migrate' in sys.modules:
+        from flask_migrate import Migrate
+        Migrate(app, db)
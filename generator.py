@@ -0,0 +1,187 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from extensions import db
+from forms import VenueForm
+from importer import insert
+from models import Venue, Artist, Show, count_shows
+
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#----------------------------------------------------------------------------#
+
+# Venues and artists spread over city/state areas of uneven size, with genre
+# lists drawn from the forms' choices, and shows over a window of past and
+# future days in which a few venues and artists get most of the bookings.
+# Everything comes from one seeded generator, so the same seed (and day)
+# gives the same rows, written in bulk with the importer's multi-row INSERT.
+
+STATES = [value for value, _ in VenueForm.state.kwargs['choices']]
+GENRES = [value for value, _ in VenueForm.genres.kwargs['choices']]
+# how often a genre is picked, relative to the others (1 when not listed)
+GENRE_WEIGHTS = {
+    'Rock n Roll': 10, 'Pop': 9, 'Hip-Hop': 8, 'Alternative': 7, 'Jazz': 6, 'Electronic': 6,
+    'R&B': 5, 'Country': 5, 'Folk': 4, 'Blues': 4, 'Punk': 3, 'Soul': 3, 'Heavy Metal': 3,
+    'Reggae': 2, 'Funk': 2, 'Classical': 2, 'Instrumental': 2, 'Musical Theatre': 1,
+}
+
+CITY_STARTS = ['Spring', 'River', 'Oak', 'Maple', 'Cedar', 'Lake', 'Fair', 'Green', 'Mill', 'Clear',
+               'Rock', 'Pine', 'Red', 'Silver', 'Ash', 'Elm', 'Bridge', 'Stone', 'Wood', 'Port']
+CITY_ENDS = ['field', 'ville', 'ton', 'wood', 'port', 'dale', 'view', 'burg', 'ford', 'side', 'brook', 'haven']
+VENUE_WORDS = (['The Old', 'The Blue', 'The Velvet', 'Park Square', 'The Musical', 'The Golden', 'Red Door', 'The Dueling'],
+               ['Hop', 'Room', 'Lounge', 'Hall', 'Tavern', 'Theatre', 'Garden', 'Pianos Bar', 'Music & Coffee'])
+ARTIST_WORDS = (['Guns N', 'The Wild', 'Matt', 'Electric', 'Midnight', 'Silver', 'Lonely', 'Neon', 'Black'],
+                ['Petals', 'Sax Band', 'Quevedo', 'Owls', 'Riders', 'Collective', 'Trio', 'Quartet', 'Kings'])
+
+# shows start in one of these daily slots (evening ones more often) and end
+# before the next one, so a venue or artist free in a slot is free of
+# overlaps: a start offset plus duration never exceeds SLOT_MINUTES
+SLOT_HOURS = (12, 15, 18, 21)
+SLOT_WEIGHTS = (1, 2, 4, 3)
+SLOT_MINUTES = 180
+START_OFFSETS = (0, 15, 30)
+DURATIONS = (60, 90, 120, 120, 150)
+
+
+class GenerateReport:
+    def __init__(self):
+        self.venues = 0
+        self.artists = 0
+        self.shows = 0
+        # shows given up because their venue and artist had no common free slot
+        self.skipped = 0
+
+
+def popularity(rng, count, sigma=1.2):
+    # cumulative log-normal weights, for rng.choices: most entries get a
+    # few draws, a handful get tens of times the average
+    return list(accumulate(rng.lognormvariate(0, sigma) for _ in range(count)))
+
+def make_areas(rng, count):
+    # count distinct (city, state) pairs
+    areas = set()
+    while len(areas) < min(count, len(CITY_STARTS) * len(CITY_ENDS) * len(STATES)):
+        areas.add((rng.choice(CITY_STARTS) + rng.choice(CITY_ENDS), rng.choice(STATES)))
+    return sorted(areas)
+
+def pick_genres(rng):
+    # one to three distinct genres, the common ones more likely
+    weights = [GENRE_WEIGHTS.get(genre, 1) for genre in GENRES]
+    genres = []
+    for _ in range(rng.choices((1, 2, 3), (5, 3, 2))[0]):
+        genre = rng.choices(GENRES, weights)[0]
+        if genre not in genres:
+            genres.append(genre)
+    return genres
+
+def profile_values(rng, number, area, words):
+    city, state = area
+    name = f'{rng.choice(words[0])} {rng.choice(words[1])} {number}'
+    slug = ''.join(character if character.isalnum() else '-' for character in name.lower())
+    return {
+        'name': name,
+        'city': city,
+        'state': state,
+        'phone': f'{rng.randrange(200, 1000)}-{rng.randrange(200, 1000)}-{rng.randrange(0, 10000):04}',
+        'genres': pick_genres(rng),
+        'image_link': f'https://images.example.com/{slug}.jpg',
+        'facebook_link': f'https://www.facebook.com/{slug}',
+        'website': f'https://www.{slug}.example.com',
+    }
+
+def venue_values(rng, number, area):
+    seeking = rng.random() < 0.3
+    return dict(profile_values(rng, number, area, VENUE_WORDS),
+                address=f'{rng.randrange(1, 3000)} {rng.choice(CITY_STARTS)} Street',
+                seeking_talent=seeking,
+                seeking_description='We are looking for local acts on weekends.' if seeking else None)
+
+def artist_values(rng, number, area):
+    seeking = rng.random() < 0.3
+    return dict(profile_values(rng, number, area, ARTIST_WORDS),
+                seeking_venue=seeking,
+                seeking_description='Looking for shows in the area.' if seeking else None)
+
+def insert_batches(model, rows, batch_size):
+    # writes the rows one multi-row INSERT and transaction per batch and
+    # returns their ids; show counters are left to the caller
+    ids, batch = [], []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            ids += insert(model, batch, count=False)
+            db.session.commit()
+            batch = []
+    if batch:
+        ids += insert(model, batch, count=False)
+        db.session.commit()
+    return ids
+
+def show_rows(rng, venue_ids, artist_ids, count, first_day, days, report, tries=10):
+    # count shows between popular venues and artists; a pair is drawn again
+    # (up to tries times) when the venue or the artist is taken in the slot
+    venue_weights, artist_weights = popularity(rng, len(venue_ids)), popularity(rng, len(artist_ids))
+    slot_weights = list(accumulate(SLOT_WEIGHTS))
+    booked = set()
+    now = datetime.now()
+    for _ in range(count):
+        for _ in range(tries):
+            venue_id = rng.choices(venue_ids, cum_weights=venue_weights)[0]
+            artist_id = rng.choices(artist_ids, cum_weights=artist_weights)[0]
+            day = rng.randrange(days)
+            slot = day * len(SLOT_HOURS) + rng.choices(range(len(SLOT_HOURS)), cum_weights=slot_weights)[0]
+            if ('venue', venue_id, slot) not in booked and ('artist', artist_id, slot) not in booked:
+                break
+        else:
+            report.skipped += 1
+            continue
+        booked.add(('venue', venue_id, slot))
+        booked.add(('artist', artist_id, slot))
+        duration = rng.choice(DURATIONS)
+        offset = rng.choice([offset for offset in START_OFFSETS if offset + duration <= SLOT_MINUTES])
+        start_time = first_day + timedelta(days=day, hours=SLOT_HOURS[slot % len(SLOT_HOURS)], minutes=offset)
+        yield {
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': start_time,
+            'duration': duration,
+            'past': start_time <= now,
+        }
+        report.shows += 1
+
+def generate_data(venues, artists, shows, seed=0, areas=200, past_days=365, future_days=180,
+                  today=None, batch_size=5000):
+    # adds the venues, artists and shows (between the new venues and
+    # artists) to the database; shows start between past_days before today
+    # (midnight, by default of the current day) and future_days after it
+    rng = random.Random(seed)
+    today = (today or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    report = GenerateReport()
+
+    places = make_areas(rng, areas)
+    # a few big cities hold most of the venues and artists
+    area_weights = popularity(rng, len(places))
+    venue_ids = insert_batches(Venue, (
+        venue_values(rng, number, rng.choices(places, cum_weights=area_weights)[0]) for number in range(venues)
+    ), batch_size)
+    report.venues = len(venue_ids)
+    artist_ids = insert_batches(Artist, (
+        artist_values(rng, number, rng.choices(places, cum_weights=area_weights)[0]) for number in range(artists)
+    ), batch_size)
+    report.artists = len(artist_ids)
+
+    if shows and venue_ids and artist_ids:
+        show_ids = insert_batches(Show, show_rows(rng, venue_ids, artist_ids, shows, today - timedelta(days=past_days),
+                                                  past_days + future_days, report), batch_size)
+        # the counters of the new venues and artists, in one pass over all
+        # their shows rather than one per batch
+        count_shows([Show.id == db.func.any(db.bindparam('show_ids', show_ids, type_=ARRAY(db.Integer)))])
+        db.session.commit()
+    return report
@@ -0,0 +1,303 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import json
+import os
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+from werkzeug.datastructures import MultiDict
+
+from extensions import db
+from forms import VenueForm, ArtistForm, ShowForm
+from models import Venue, Artist, Show, count_shows, booked_shows, DEFAULT_SHOW_DURATION
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+# Rows are read from CSV or JSON lines files, validated with the same forms
+# the HTML pages use and written with one multi-row INSERT per batch, one
+# transaction per batch. Invalid rows are reported and skipped, the rest of
+# their batch is still imported. Columns left out (counters, updated_at...)
+# take their server defaults.
+
+def read_rows(path):
+    # yields (line number, row dict) from a .csv or .jsonl file, with a
+    # ValueError instead of the dict for a line that is not a JSON object
+    with open(path, newline='') as file:
+        if os.path.splitext(path)[1].lower() == '.csv':
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield number, ValueError(f'not valid JSON: {error}')
+                continue
+            yield number, row if isinstance(row, dict) else ValueError('not a JSON object')
+
+def as_list(value):
+    # genres come as a JSON list or a comma separated CSV cell
+    if isinstance(value, list):
+        return value
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+def as_choice(value):
+    # the forms' seeking_* choices are 'Y' (yes) and '' (no)
+    if isinstance(value, str):
+        return 'Y' if value.strip().lower() in ('y', 'yes', 'true', '1') else ''
+    return 'Y' if value else ''
+
+def as_text(value):
+    return '' if value is None else str(value)
+
+def validate(form, row, lists=(), choices=()):
+    # runs the row through the form (one instance is reused for every row of
+    # an import) and returns its errors, as the HTML form would report them
+    formdata = MultiDict()
+    for name, value in row.items():
+        if name in lists:
+            for item in as_list(value):
+                formdata.add(name, item)
+        elif name in choices:
+            formdata.add(name, as_choice(value))
+        else:
+            formdata.add(name, as_text(value))
+    for name in choices:
+        if name not in row:
+            formdata.add(name, '')
+    form.process(formdata=formdata)
+    form.validate()
+    return dict(form.errors)
+
+
+def venue_values(form, row):
+    errors = validate(form, row, lists=('genres',), choices=('seeking_talent',))
+    return errors, {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'address': form.address.data,
+        'phone': form.phone.data,
+        'image_link': form.image_link.data,
+        'genres': form.genres.data,
+        'facebook_link': form.facebook_link.data,
+        'website': form.website.data,
+        'seeking_talent': form.seeking_talent.data == 'Y',
+        'seeking_description': form.seeking_description.data
+    }
+
+def artist_values(form, row):
+    errors = validate(form, row, lists=('genres',), choices=('seeking_venue',))
+    return errors, {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'phone': form.phone.data,
+        'image_link': form.image_link.data,
+        'genres': form.genres.data,
+        'facebook_link': form.facebook_link.data,
+        'website': form.website.data,
+        'seeking_venue': form.seeking_venue.data == 'Y',
+        'seeking_description': form.seeking_description.data
+    }
+
+def as_form_datetime(value):
+    # ShowForm expects 'YYYY-MM-DD HH:MM:SS', ISO timestamps (as exported)
+    # are accepted too
+    try:
+        return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return value
+
+def show_values(form, row):
+    # start_time is always passed to the form, so a row without one fails
+    # DataRequired instead of taking the field's default
+    row = dict(row, start_time=as_form_datetime(row.get('start_time')))
+    errors = validate(form, row)
+    values = {'start_time': form.start_time.data, 'duration': form.duration.data or DEFAULT_SHOW_DURATION}
+    for field in ('artist_id', 'venue_id'):
+        try:
+            values[field] = int(getattr(form, field).data)
+        except (TypeError, ValueError):
+            errors.setdefault(field, []).append('Not a valid id.')
+    return errors, values
+
+
+MODELS = {
+    'venues': (Venue, VenueForm, venue_values),
+    'artists': (Artist, ArtistForm, artist_values),
+    'shows': (Show, ShowForm, show_values),
+}
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+def missing_references(batch):
+    # ids of venues and artists referenced by a batch of shows that do not
+    # exist, with one query per table
+    missing = {}
+    for model, field in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+        ids = {values[field] for _, values in batch}
+        found = {id for id, in db.session.query(model.id).filter(model.id.in_(ids))}
+        missing[field] = ids - found
+    return missing
+
+def insert_batch(model, batch, report):
+    # batch is a list of (line number, column values)
+    if model is Show:
+        missing = missing_references(batch)
+        valid = []
+        for line, values in batch:
+            unknown = [field for field in ('venue_id', 'artist_id') if values[field] in missing[field]]
+            if unknown:
+                report.error(line, ', '.join(f'{field} {values[field]} does not exist' for field in unknown))
+            else:
+                valid.append((line, values))
+        batch = valid
+        now = datetime.now()
+        for _, values in batch:
+            values['past'] = values['start_time'] <= now
+    if not batch:
+        return
+
+    try:
+        insert(model, [values for _, values in batch])
+        db.session.commit()
+        report.imported += len(batch)
+    except Exception:
+        db.session.rollback()
+        # find the offending rows one by one, keeping the others
+        for line, values in batch:
+            try:
+                insert(model, [values])
+                db.session.commit()
+                report.imported += 1
+            except Exception as error:
+                db.session.rollback()
+                report.error(line, str(getattr(error, 'orig', error)).strip())
+
+def insert(model, rows, count=True):
+    # a single INSERT ... VALUES (...), (...) built by psycopg2, far cheaper
+    # than compiling one SQLAlchemy bind parameter per value; count=False
+    # leaves the show counters to the caller (e.g. once for many batches)
+    columns = list(rows[0])
+    statement = 'INSERT INTO "{}" ({}) VALUES %s RETURNING id'.format(
+        model.__tablename__, ', '.join(f'"{column}"' for column in columns))
+    cursor = db.session.connection().connection.cursor()
+    ids = [id for id, in execute_values(cursor, statement, [[row[column] for column in columns] for row in rows],
+                                        page_size=len(rows), fetch=True)]
+    if model is Show and count:
+        count_shows([Show.id.in_(ids)])
+    return ids
+
+def import_rows(kind, path, batch_size=1000):
+    model, form_class, row_values = MODELS[kind]
+    form = form_class(formdata=None, meta={'csrf': False})
+    report = ImportReport()
+    batch = []
+    for line, row in read_rows(path):
+        if isinstance(row, ValueError):
+            report.error(line, str(row))
+            continue
+        errors, values = row_values(form, row)
+        if errors:
+            report.error(line, '; '.join(f'{field}: {" ".join(messages)}' for field, messages in errors.items()))
+            continue
+        batch.append((line, values))
+        if len(batch) == batch_size:
+            insert_batch(model, batch, report)
+            batch = []
+    insert_batch(model, batch, report)
+    return report
+
+
+#----------------------------------------------------------------------------#
+# Batch scheduling.
+#----------------------------------------------------------------------------#
+
+# A tour is a list of show rows (as import-data takes them) scheduled all at
+# once or not at all: every row is validated, venues and artists are checked
+# with one query each, double bookings against existing shows with one more,
+# and the shows are written with a single multi-row INSERT.
+
+def batch_overlaps(entries):
+    # (index, message) for the entries overlapping an earlier one of the same
+    # venue or artist in the batch, found in one pass over them sorted by start
+    overlaps = []
+    for field, side in (('venue_id', 'venue'), ('artist_id', 'artist')):
+        ordered = sorted(entries, key=lambda entry: (entry[1][field], entry[1]['start_time']))
+        previous, booked_until = None, None
+        for index, values in ordered:
+            end = values['start_time'] + timedelta(minutes=values['duration'])
+            if previous is not None and previous[1][field] == values[field] and values['start_time'] < booked_until:
+                overlaps.append((index, f'the {side} is already booked by entry {previous[0] + 1} at that time'))
+            if previous is None or previous[1][field] != values[field] or end > booked_until:
+                previous, booked_until = (index, values), end
+    return overlaps
+
+def existing_overlaps(entries):
+    # (index, message) for the entries overlapping shows already booked
+    overlaps = []
+    for show in booked_shows([values for _, values in entries]):
+        for index, values in entries:
+            end = values['start_time'] + timedelta(minutes=values['duration'])
+            if values['start_time'] < show.slot.upper and show.slot.lower < end:
+                for field, side in (('venue_id', 'venue'), ('artist_id', 'artist')):
+                    if getattr(show, field) == values[field]:
+                        overlaps.append((index, f'the {side} is already booked by show {show.id} at that time'))
+    return overlaps
+
+def schedule_shows(rows):
+    # returns one {'entry', 'id', 'errors'} result per row, entries numbered
+    # from 1; ids are only set when every row was valid and the shows created
+    form = ShowForm(formdata=None, meta={'csrf': False})
+    results = []
+    entries = []
+    for index, row in enumerate(rows):
+        errors, values = show_values(form, row)
+        results.append({'entry': index + 1, 'id': None, 'errors': [f'{field}: {" ".join(messages)}' for field, messages in errors.items()]})
+        if not errors:
+            entries.append((index, values))
+
+    if entries:
+        missing = missing_references(entries)
+        for index, values in entries:
+            for field in ('venue_id', 'artist_id'):
+                if values[field] in missing[field]:
+                    results[index]['errors'].append(f'{field}: {values[field]} does not exist')
+        for index, message in batch_overlaps(entries) + existing_overlaps(entries):
+            results[index]['errors'].append(message)
+    if not rows or any(result['errors'] for result in results):
+        db.session.rollback()
+        return results
+
+    now = datetime.now()
+    for _, values in entries:
+        values['past'] = values['start_time'] <= now
+    try:
+        ids = insert(Show, [values for _, values in entries])
+        db.session.commit()
+    except Exception as error:
+        # e.g. a show booked by someone else since the check
+        db.session.rollback()
+        for result in results:
+            result['errors'].append(str(getattr(error, 'orig', error)).strip())
+        return results
+    for result, id in zip(results, ids):
+        result['id'] = id
+    return results
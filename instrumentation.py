@@ -0,0 +1,134 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+import logging
+import os
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Request instrumentation.
+#----------------------------------------------------------------------------#
+
+# Every request counts its SQL statements, the time spent running them, the
+# time spent rendering templates and its slowest statement. They are sent as
+# Server-Timing headers (shown by the browsers' dev tools) and logged as one
+# JSON line on the 'app.requests' logger. Any statement slower than
+# SLOW_QUERY_MS is logged on 'app.sql' with the route that issued it. Both
+# loggers write to INSTRUMENTATION_LOG only, not to the app logger's handlers
+# (the error log outside debug mode).
+#
+# Streamed responses (/shows with STREAM_SHOWS) report what happened before
+# their first chunk only.
+
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.worst_seconds = 0.0
+        self.worst_statement = None
+
+    def record_query(self, statement, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        if seconds > self.worst_seconds:
+            self.worst_seconds = seconds
+            self.worst_statement = statement
+
+
+def current_route():
+    return request.endpoint if has_request_context() else None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_start = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def end_query(conn, cursor, statement, parameters, context, executemany):
+    if context is None or not hasattr(context, 'query_start') or not has_app_context():
+        return
+    seconds = time.perf_counter() - context.query_start
+    stats = g.get('request_stats')
+    if stats is not None:
+        stats.record_query(statement, seconds)
+    threshold = current_app.config.get('SLOW_QUERY_MS')
+    if threshold is not None and seconds * 1000 >= threshold:
+        current_app.logger.getChild('sql').warning(json.dumps({
+            'slow_query_ms': round(seconds * 1000, 1),
+            'route': current_route(),
+            'statement': statement,
+        }))
+
+
+class TimedTemplate(Template):
+    # adds the rendering time of whole pages (includes and layouts are part
+    # of them) to the request's stats
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            stats = g.get('request_stats') if has_app_context() else None
+            if stats is not None:
+                stats.render_seconds += time.perf_counter() - start
+
+
+def start_request():
+    g.request_stats = RequestStats()
+
+def report_request(response):
+    stats = g.get('request_stats')
+    if stats is None:
+        return response
+    total = time.perf_counter() - stats.start
+    response.headers['Server-Timing'] = ', '.join((
+        f'db;desc="{stats.queries} queries";dur={stats.db_seconds * 1000:.1f}',
+        f'render;dur={stats.render_seconds * 1000:.1f}',
+        f'app;dur={total * 1000:.1f}',
+    ))
+    current_app.logger.getChild('requests').info(json.dumps({
+        'method': request.method,
+        'path': request.path,
+        'route': request.endpoint,
+        'status': response.status_code,
+        'duration_ms': round(total * 1000, 1),
+        'queries': stats.queries,
+        'db_ms': round(stats.db_seconds * 1000, 1),
+        'render_ms': round(stats.render_seconds * 1000, 1),
+        'worst_query_ms': round(stats.worst_seconds * 1000, 1),
+        'worst_query': stats.worst_statement and stats.worst_statement[:200],
+    }))
+    return response
+
+def init_logging(app):
+    # one handler for both loggers, added once per file however many apps
+    # are created
+    path = os.path.abspath(app.config['INSTRUMENTATION_LOG'])
+    handler = None
+    for name in ('requests', 'sql'):
+        logger = app.logger.getChild(name)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if any(getattr(existing, 'baseFilename', None) == path for existing in logger.handlers):
+            continue
+        if handler is None:
+            handler = logging.FileHandler(path, delay=True)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(levelname)s: %(message)s'))
+        logger.addHandler(handler)
+
+def init_app(app):
+    init_logging(app)
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+    app.jinja_env.template_class = TimedTemplate
+    app.before_request(start_request)
+    app.after_request(report_request)
@@ -0,0 +1,185 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+# Each worker process counts the requests it serves and their latency per
+# endpoint. With METRICS_DIR set, every worker writes its numbers to
+# <METRICS_DIR>/<pid>.json (at most once per METRICS_DUMP_INTERVAL seconds,
+# and on exit), and /metrics adds up the files of all workers, so whichever
+# worker answers the scrape reports the whole server. Counters of workers
+# that have exited are kept; gauges only come from live ones. METRICS_DIR
+# should be emptied when the server (re)starts. Without it, /metrics reports
+# the answering process only.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HELP = {
+    'http_requests_total': ('counter', 'Requests served, by endpoint, method and status.'),
+    'http_request_errors_total': ('counter', 'Requests answered with a 5xx status, by endpoint.'),
+    'http_request_duration_seconds': ('histogram', 'Time spent serving requests, by endpoint.'),
+}
+
+
+class Metrics:
+    def __init__(self, directory=None, dump_interval=1.0, collect=None):
+        # collect() returns this process' {name: (type, help, value)} extra
+        # counters and gauges (pool, cache...) when called in an app context
+        self.directory = directory
+        self.dump_interval = dump_interval
+        self.collect = collect
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.errors = Counter()
+        self.latency = {}
+        self.extra = {}
+        self.last_dump = 0.0
+
+    def observe(self, endpoint, method, status, seconds):
+        with self.lock:
+            self.requests[(endpoint, method, str(status))] += 1
+            if status >= 500:
+                self.errors[endpoint] += 1
+            buckets = self.latency.setdefault(endpoint, [0] * len(LATENCY_BUCKETS) + [0.0, 0])
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    buckets[index] += 1
+                    break
+            buckets[-2] += seconds
+            buckets[-1] += 1
+
+    def snapshot(self, collect=True):
+        # collect=False reuses the extra values of the previous snapshot
+        if collect and self.collect is not None:
+            self.extra = self.collect()
+        with self.lock:
+            return {
+                'requests': [list(key) + [count] for key, count in self.requests.items()],
+                'errors': dict(self.errors),
+                'latency': {endpoint: list(buckets) for endpoint, buckets in self.latency.items()},
+                'extra': self.extra,
+            }
+
+    def dump(self, snapshot=None):
+        # atomically replaces this worker's file
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as file:
+            json.dump(snapshot or self.snapshot(), file)
+        os.replace(path + '.tmp', path)
+        self.last_dump = time.monotonic()
+
+    def maybe_dump(self):
+        if self.directory and time.monotonic() - self.last_dump >= self.dump_interval:
+            self.dump()
+
+    def snapshots(self):
+        # (snapshot, alive) of every worker, this one's taken now
+        own = self.snapshot()
+        if not self.directory:
+            return [(own, True)]
+        self.dump(own)
+        result = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            pid = int(os.path.basename(path)[:-5])
+            try:
+                with open(path) as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            result.append((own if pid == os.getpid() else snapshot, pid_alive(pid)))
+        return result
+
+    def render(self):
+        # Prometheus text exposition format
+        requests = Counter()
+        errors = Counter()
+        latency = {}
+        extra = {}
+        for snapshot, alive in self.snapshots():
+            for endpoint, method, status, count in snapshot['requests']:
+                requests[(endpoint, method, status)] += count
+            errors.update(snapshot['errors'])
+            for endpoint, buckets in snapshot['latency'].items():
+                total = latency.setdefault(endpoint, [0] * len(buckets))
+                latency[endpoint] = [a + b for a, b in zip(total, buckets)]
+            for name, (type, help, value) in snapshot['extra'].items():
+                if type == 'counter' or alive:
+                    previous = extra.get(name, (type, help, 0))
+                    extra[name] = (type, help, previous[2] + value)
+
+        lines = []
+        def header(name, type, help):
+            lines.append(f'# HELP fyyur_{name} {help}')
+            lines.append(f'# TYPE fyyur_{name} {type}')
+
+        header('http_requests_total', *HELP['http_requests_total'])
+        for (endpoint, method, status), count in sorted(requests.items()):
+            lines.append(f'fyyur_http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+        header('http_request_errors_total', *HELP['http_request_errors_total'])
+        for endpoint, count in sorted(errors.items()):
+            lines.append(f'fyyur_http_request_errors_total{{endpoint="{endpoint}"}} {count}')
+        header('http_request_duration_seconds', *HELP['http_request_duration_seconds'])
+        for endpoint, buckets in sorted(latency.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, buckets):
+                cumulative += count
+                lines.append(f'fyyur_http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'fyyur_http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {buckets[-1]}')
+            lines.append(f'fyyur_http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {buckets[-2]}')
+            lines.append(f'fyyur_http_request_duration_seconds_count{{endpoint="{endpoint}"}} {buckets[-1]}')
+        for name, (type, help, value) in sorted(extra.items()):
+            header(name, type, help)
+            lines.append(f'fyyur_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def endpoint_name(endpoint):
+    # 'main.show_venue' -> 'show_venue'; requests matching no route -> 'none'
+    return endpoint.rpartition('.')[2] if endpoint else 'none'
+
+
+def init_app(app, collect=None):
+    metrics = Metrics(app.config['METRICS_DIR'], app.config['METRICS_DUMP_INTERVAL'], collect)
+    app.extensions['metrics'] = metrics
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        if 'metrics_start' in g:
+            metrics.observe(endpoint_name(request.endpoint), request.method, response.status_code,
+                            time.perf_counter() - g.metrics_start)
+            metrics.maybe_dump()
+        return response
+
+    if metrics.directory:
+        os.makedirs(metrics.directory, exist_ok=True)
+        # there is no app context left to collect the extra values at exit
+        atexit.register(lambda: metrics.dump(metrics.snapshot(collect=False)))
+    return metrics
@@ -0,0 +1,28 @@
+"""updated_at
+
+Revision ID: 0f5a9d6e13b8
+Revises: b81e4a3c27d5
+Create Date: 2026-10-18 10:41:55.230874
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0f5a9d6e13b8'
+down_revision = 'b81e4a3c27d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist', 'Show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False))
+        op.create_index(op.f(f'ix_{table}_updated_at'), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        op.drop_index(op.f(f'ix_{table}_updated_at'), table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,26 @@
+"""edit versions
+
+Revision ID: 3f6b2d8c91e4
+Revises: 9a4d7b6e0c21
+Create Date: 2026-10-18 14:22:09.671538
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6b2d8c91e4'
+down_revision = '9a4d7b6e0c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('Artist', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    op.drop_column('Artist', 'version')
+    op.drop_column('Venue', 'version')
@@ -0,0 +1,39 @@
+"""show duration
+
+Revision ID: 5c8e1f2a7d30
+Revises: e27c4b9a85f1
+Create Date: 2026-10-18 13:04:51.207316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5c8e1f2a7d30'
+down_revision = 'e27c4b9a85f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # btree_gist lets gist indexes mix the = on ids with the && on ranges
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('Show', sa.Column('duration', sa.Integer(), server_default='120', nullable=False))
+    op.add_column('Show', sa.Column('slot', postgresql.TSRANGE(),
+                                    sa.Computed("tsrange(start_time, start_time + duration * interval '1 minute')"),
+                                    nullable=True))
+    op.create_check_constraint('Show_duration_check', 'Show', 'duration > 0')
+    # serve `flask audit-bookings` until 9a4d7b6e0c21 replaces them with the
+    # exclusion constraints
+    op.create_index('ix_Show_venue_id_slot', 'Show', ['venue_id', 'slot'], unique=False, postgresql_using='gist')
+    op.create_index('ix_Show_artist_id_slot', 'Show', ['artist_id', 'slot'], unique=False, postgresql_using='gist')
+
+
+def downgrade():
+    op.drop_index('ix_Show_artist_id_slot', table_name='Show')
+    op.drop_index('ix_Show_venue_id_slot', table_name='Show')
+    op.drop_constraint('Show_duration_check', 'Show', type_='check')
+    op.drop_column('Show', 'slot')
+    op.drop_column('Show', 'duration')
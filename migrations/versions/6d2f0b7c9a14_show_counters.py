@@ -0,0 +1,38 @@
+"""show counters
+
+Revision ID: 6d2f0b7c9a14
+Revises: 92e3c0b840c2
+Create Date: 2026-10-18 09:12:40.511203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d2f0b7c9a14'
+down_revision = '92e3c0b840c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('past', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.execute('UPDATE "Show" SET past = true WHERE start_time <= now()')
+
+    # backfill the counters from the existing shows before making them required
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute(f'''
+            UPDATE "{table}" SET
+                past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{key} = "{table}".id AND "Show".past),
+                upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{key} = "{table}".id AND NOT "Show".past)
+        ''')
+        op.alter_column(table, 'past_shows_count', existing_type=sa.Integer(), server_default='0', nullable=False)
+        op.alter_column(table, 'upcoming_shows_count', existing_type=sa.Integer(), server_default='0', nullable=False)
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.alter_column(table, 'upcoming_shows_count', existing_type=sa.Integer(), server_default=None, nullable=True)
+        op.alter_column(table, 'past_shows_count', existing_type=sa.Integer(), server_default=None, nullable=True)
+    op.drop_column('Show', 'past')
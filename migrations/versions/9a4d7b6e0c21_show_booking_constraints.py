@@ -0,0 +1,39 @@
+"""show booking constraints
+
+Revision ID: 9a4d7b6e0c21
+Revises: 5c8e1f2a7d30
+Create Date: 2026-10-18 13:11:36.480952
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4d7b6e0c21'
+down_revision = '5c8e1f2a7d30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # exclusion constraints cannot be added NOT VALID, existing double
+    # bookings have to be fixed first
+    overlaps = op.get_bind().execute(sa.text('''
+        SELECT count(*) FROM "Show" a JOIN "Show" b ON b.id > a.id AND b.slot && a.slot
+            AND (b.venue_id = a.venue_id OR b.artist_id = a.artist_id)
+    ''')).scalar()
+    if overlaps:
+        raise RuntimeError(f'{overlaps} overlapping show bookings: run `flask db upgrade 5c8e1f2a7d30`, '
+                           'list them with `flask audit-bookings` and fix them before upgrading')
+    op.execute('ALTER TABLE "Show" ADD CONSTRAINT "Show_venue_id_slot_excl" EXCLUDE USING gist (venue_id WITH =, slot WITH &&)')
+    op.execute('ALTER TABLE "Show" ADD CONSTRAINT "Show_artist_id_slot_excl" EXCLUDE USING gist (artist_id WITH =, slot WITH &&)')
+    op.drop_index('ix_Show_artist_id_slot', table_name='Show')
+    op.drop_index('ix_Show_venue_id_slot', table_name='Show')
+
+
+def downgrade():
+    op.create_index('ix_Show_venue_id_slot', 'Show', ['venue_id', 'slot'], unique=False, postgresql_using='gist')
+    op.create_index('ix_Show_artist_id_slot', 'Show', ['artist_id', 'slot'], unique=False, postgresql_using='gist')
+    op.drop_constraint('Show_artist_id_slot_excl', 'Show')
+    op.drop_constraint('Show_venue_id_slot_excl', 'Show')
@@ -0,0 +1,30 @@
+"""name trigram indexes
+
+Revision ID: b81e4a3c27d5
+Revises: 6d2f0b7c9a14
+Create Date: 2026-10-18 10:03:17.842095
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81e4a3c27d5'
+down_revision = '6d2f0b7c9a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm lets GIN indexes serve ILIKE '%term%' and ranks by similarity()
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_Venue_name_trgm', table_name='Venue')
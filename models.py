@@ -2,7 +2,9 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-from app import db
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.postgresql import ExcludeConstraint, TSRANGE
+from extensions import db
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -10,6 +12,9 @@ from app import db
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -23,8 +28,11 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String())
     genres = db.Column(db.ARRAY(db.String(120)))
-    past_shows_count = db.Column(db.Integer)
-    upcoming_shows_count = db.Column(db.Integer)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.func.timezone('utc', db.func.now()))
+    # bumped by every edit, see update_versioned
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     shows = db.relationship('Show', backref='venue', lazy=True)
 
     def __repr__(self):
@@ -34,6 +42,9 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -46,8 +57,11 @@ class Artist(db.Model):
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String())
-    past_shows_count = db.Column(db.Integer)
-    upcoming_shows_count = db.Column(db.Integer)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.func.timezone('utc', db.func.now()))
+    # bumped by every edit, see update_versioned
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     shows = db.relationship('Show', backref='artist', lazy=True)
 
     def __repr__(self):
@@ -57,13 +71,148 @@ class Artist(db.Model):
 
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration. --- DONE
 
+DEFAULT_SHOW_DURATION = 120
+
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        # detail pages filter by venue/artist and sort by time, /shows pages by (start_time, id)
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        # a venue or an artist cannot play two shows at once; the gist indexes
+        # behind these also serve the overlap audit (needs btree_gist)
+        ExcludeConstraint(('venue_id', '='), ('slot', '&&'), name='Show_venue_id_slot_excl', using='gist'),
+        ExcludeConstraint(('artist_id', '='), ('slot', '&&'), name='Show_artist_id_slot_excl', using='gist'),
+        db.CheckConstraint('duration > 0', name='Show_duration_check'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
+    # in minutes, shows listed without one get DEFAULT_SHOW_DURATION
+    duration = db.Column(db.Integer, nullable=False, default=DEFAULT_SHOW_DURATION, server_default=str(DEFAULT_SHOW_DURATION))
+    # [start_time, start_time + duration), maintained by the database
+    slot = db.Column(TSRANGE, db.Computed("tsrange(start_time, start_time + duration * interval '1 minute')"))
+    # whether the show is counted in past_shows_count (True) or upcoming_shows_count (False)
+    past = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.func.timezone('utc', db.func.now()))
 
     def __repr__(self):
       return f'<Show ID:{self.id}, Artist ID:{self.artist_id}, Venue ID:{self.venue_id}, Start Time:{self.start_time}>'
+
+
+#----------------------------------------------------------------------------#
+# Edits.
+#----------------------------------------------------------------------------#
+
+# Venue and Artist rows are edited with optimistic concurrency: an edit only
+# applies to the version of the row it was made from, and bumps it.
+
+def update_versioned(model, id, version, values, *returning):
+    # UPDATE ... SET values WHERE id AND version in one statement; returns
+    # the RETURNING row (version, *returning), or None when the row changed
+    # since version or is gone
+    table = model.__table__
+    return db.session.execute(table.update()
+        .where(db.and_(table.c.id == id, table.c.version == version))
+        .values(version=table.c.version + 1, **values)
+        .returning(table.c.version, *returning)).first()
+
+def related_ids(column, key, id):
+    # ARRAY(SELECT DISTINCT column FROM Show WHERE key = id), e.g. the artists
+    # of a venue, to be returned along with an update
+    return db.func.array(db.select([column]).where(key == id).distinct().as_scalar())
+
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Venue and Artist keep denormalized past/upcoming show counters so listings
+# never have to count shows. Counters are adjusted in bulk, one UPDATE per
+# table, from the shows matching some criteria.
+# Adjustments hold ROLLOVER_LOCK_ID shared and the rollover holds it
+# exclusively, so a show is never counted on one side by a create or delete
+# while the rollover moves it to the other.
+
+ROLLOVER_LOCK_ID = 4711
+
+def update_show_counters(model, key, criteria, past, upcoming):
+    # add sum(past) and sum(upcoming) over the matching shows to the counters
+    # of the model rows they reference through the Show column key
+    counts = db.session.query(
+        key.label('id'),
+        db.func.sum(past).label('past'),
+        db.func.sum(upcoming).label('upcoming')
+    ).filter(*criteria).group_by(key).subquery()
+    table = model.__table__
+    db.session.execute(table.update().where(table.c.id == counts.c.id).values(
+        past_shows_count=table.c.past_shows_count + counts.c.past,
+        upcoming_shows_count=table.c.upcoming_shows_count + counts.c.upcoming
+    ))
+
+def count_shows(criteria, sign=1):
+    # add (sign=1) or remove (sign=-1) the matching shows from the counters
+    # of their venues and artists
+    db.session.execute(db.select([db.func.pg_advisory_xact_lock_shared(ROLLOVER_LOCK_ID)]))
+    past = db.case([(Show.past, sign)], else_=0)
+    upcoming = db.case([(Show.past, 0)], else_=sign)
+    update_show_counters(Venue, Show.venue_id, criteria, past, upcoming)
+    update_show_counters(Artist, Show.artist_id, criteria, past, upcoming)
+
+def rollover_shows(now):
+    # move the shows that have started since the last run from upcoming to
+    # past, serialized so two concurrent runs cannot move a show twice;
+    # returns the (venue_id, artist_id) of the shows moved
+    db.session.execute(db.select([db.func.pg_advisory_xact_lock(ROLLOVER_LOCK_ID)]))
+    due = (Show.past == db.false(), Show.start_time <= now)
+    update_show_counters(Venue, Show.venue_id, due, db.literal(1), db.literal(-1))
+    update_show_counters(Artist, Show.artist_id, due, db.literal(1), db.literal(-1))
+    table = Show.__table__
+    return db.session.execute(table.update().where(db.and_(*due)).values(past=True)
+        .returning(table.c.venue_id, table.c.artist_id)).fetchall()
+
+
+#----------------------------------------------------------------------------#
+# Bookings.
+#----------------------------------------------------------------------------#
+
+# Overlapping shows are rejected by the exclusion constraints on Show, in the
+# INSERT/UPDATE itself. These helpers name the side of a rejected booking and
+# find overlaps in data loaded before the constraints existed.
+
+BOOKING_CONSTRAINTS = {
+    'Show_venue_id_slot_excl': 'venue',
+    'Show_artist_id_slot_excl': 'artist',
+}
+
+def booking_conflict(error):
+    # 'venue' or 'artist' when error (an IntegrityError) is a double booking
+    diag = getattr(getattr(error, 'orig', None), 'diag', None)
+    return BOOKING_CONSTRAINTS.get(getattr(diag, 'constraint_name', None))
+
+def booked_shows(entries):
+    # shows overlapping any of entries (dicts with venue_id, artist_id,
+    # start_time and duration) at the same venue or with the same artist, in
+    # one query answered from the constraints' gist indexes
+    return Show.query.filter(db.or_(*(
+        db.and_(
+            db.or_(Show.venue_id == entry['venue_id'], Show.artist_id == entry['artist_id']),
+            Show.slot.op('&&')(db.func.tsrange(entry['start_time'], entry['start_time'] + timedelta(minutes=entry['duration'])))
+        )
+        for entry in entries
+    ))).all()
+
+def overlapping_shows(key):
+    # (key value, show, other show) for every pair of shows with the same
+    # key (Show.venue_id or Show.artist_id) whose slots overlap; each show
+    # probes the (key, slot) gist index for its later overlapping ones
+    other = db.aliased(Show)
+    other_key = getattr(other, key.key)
+    return db.session.query(key, Show.id, Show.slot, other.id, other.slot).join(other, db.and_(
+        other_key == key,
+        other.slot.op('&&')(Show.slot),
+        other.id > Show.id
+    )).order_by(key, Show.start_time, Show.id)
@@ -0,0 +1,85 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+# Every worker process has its own pool of DB_POOL_SIZE connections, plus up
+# to DB_MAX_OVERFLOW extra ones under load; a request that cannot get one
+# within DB_POOL_TIMEOUT seconds fails. Behind PgBouncer the pooling is left
+# to it and each checkout opens a (cheap) PgBouncer connection.
+
+class TimedQueuePool(QueuePool):
+    # a QueuePool that also counts checkouts, timeouts and the time spent
+    # waiting for a connection
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            with self.stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self.stats_lock:
+                self.checkouts += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+def engine_options(config):
+    # SQLALCHEMY_ENGINE_OPTIONS for the DB_POOL_* / DB_PGBOUNCER settings
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    if config['DB_PGBOUNCER']:
+        # psycopg2 sends plain queries (nothing is prepared server side) and
+        # the app only takes transaction level advisory locks, so it runs on
+        # a transaction pooling PgBouncer as long as it holds no pool itself
+        options['poolclass'] = NullPool
+        return options
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+        pool_recycle=config['DB_POOL_RECYCLE'],
+    )
+    return options
+
+def pool_stats(pool):
+    # current state of a worker's pool, as numbers for monitoring
+    if not isinstance(pool, QueuePool):
+        return {'pooled': False}
+    stats = {
+        'pooled': True,
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        # connections opened beyond size; negative while the pool fills up
+        'overflow': pool.overflow(),
+    }
+    if isinstance(pool, TimedQueuePool):
+        with pool.stats_lock:
+            stats.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                wait_seconds=pool.wait_seconds,
+                max_wait_seconds=pool.max_wait_seconds,
+            )
+    return stats
@@ -0,0 +1,95 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Profiling.
+#----------------------------------------------------------------------------#
+
+# With PROFILING on and a PROFILE_TOKEN set, a request carrying the token in
+# an X-Profile-Token header or a ?profile= argument runs under cProfile, past
+# the page cache, and leaves in PROFILE_DIR:
+#
+#   <id>.pstats    the profile (python -m pstats, snakeviz, flameprof...)
+#   <id>.txt       the 50 most expensive calls by cumulative time
+#   <id>.sql.json  the SQL statements it issued, with their durations
+#
+# <id> (time, endpoint and pid) is returned in the X-Profile-Id header.
+
+def requested(config):
+    token = request.headers.get('X-Profile-Token') or request.args.get('profile')
+    # compared as bytes, compare_digest rejects non-ASCII str
+    return bool(token) and hmac.compare_digest(token.encode(), config['PROFILE_TOKEN'].encode())
+
+def profiled_path():
+    # the request's path and arguments, without the token
+    args = [(name, value) for name, value in request.args.items(multi=True) if name != 'profile']
+    return request.path + ('?' + urlencode(args) if args else '')
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and g.get('profile') is not None:
+        conn.info['profile_query_start'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def end_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and g.get('profile') is not None and 'profile_query_start' in conn.info:
+        seconds = time.perf_counter() - conn.info.pop('profile_query_start')
+        g.profile_statements.append({'ms': round(seconds * 1000, 3), 'statement': statement})
+
+
+def start_profile():
+    if not requested(current_app.config):
+        return
+    g.profile_statements = []
+    g.profile = cProfile.Profile()
+    g.profile.enable()
+
+def save_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    profile.disable()
+    url = profiled_path()
+    directory = current_app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    profile_id = f'{datetime.now():%Y%m%d-%H%M%S-%f}-{request.endpoint}-{os.getpid()}'
+    path = os.path.join(directory, profile_id)
+    profile.dump_stats(path + '.pstats')
+    report = io.StringIO()
+    pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(50)
+    with open(path + '.txt', 'w') as file:
+        file.write(f'{request.method} {url} -> {response.status_code}\n')
+        file.write(report.getvalue())
+    with open(path + '.sql.json', 'w') as file:
+        json.dump({
+            'method': request.method,
+            'path': url,
+            'endpoint': request.endpoint,
+            'queries': len(g.profile_statements),
+            'db_ms': round(sum(query['ms'] for query in g.profile_statements), 3),
+            'statements': g.profile_statements,
+        }, file, indent=2)
+    current_app.logger.info(f'profile of {url} saved as {path}.*')
+    response.headers['X-Profile-Id'] = profile_id
+    return response
+
+def init_app(app):
+    if not (app.config['PROFILING'] and app.config['PROFILE_TOKEN']):
+        return
+    app.before_request(start_profile)
+    app.after_request(save_profile)
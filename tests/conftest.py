@@ -0,0 +1,152 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+#----------------------------------------------------------------------------#
+# Fixtures.
+#----------------------------------------------------------------------------#
+
+# The tests need PostgreSQL (with the pg_trgm and btree_gist extensions) and
+# are skipped when DATABASE_URL is not set. They leave the tables already in
+# that database alone: theirs are created in a schema of their own, first on
+# the search_path, which is dropped at the end of the run. No app context is
+# kept pushed while a test runs, so each request gets a fresh one (and g).
+
+SCHEMA = 'fyyur_test'
+REPLICA_SCHEMA = 'fyyur_test_replica'
+
+
+def schema_url(url, schema):
+    # url with schema first on the search_path of its connections
+    return url + ('&' if '?' in url else '?') + f'options=-csearch_path%3D{schema}%2Cpublic'
+
+
+@pytest.fixture(scope='session')
+def app():
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        pytest.skip('DATABASE_URL is not set')
+
+    from app import create_app
+    from extensions import db
+
+    app = create_app(SQLALCHEMY_DATABASE_URI=schema_url(url, SCHEMA), SQLALCHEMY_BINDS={}, CACHE_BACKEND=None,
+                     TESTING=True)
+    with app.app_context():
+        available = {name for name, in db.session.execute('SELECT name FROM pg_available_extensions')}
+        missing = {'pg_trgm', 'btree_gist'} - available
+        if missing:
+            pytest.skip(f"the database server lacks the {', '.join(sorted(missing))} extension(s)")
+        for extension in ('pg_trgm', 'btree_gist'):
+            db.session.execute(f'CREATE EXTENSION IF NOT EXISTS {extension} SCHEMA public')
+        db.session.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        db.session.execute(f'CREATE SCHEMA {SCHEMA}')
+        db.session.commit()
+        # without checkfirst, as the app's own tables in public are visible
+        # through the search_path and would be taken for the test ones
+        db.Model.metadata.create_all(bind=db.engine, checkfirst=False)
+        db.session.remove()
+
+    yield app
+
+    with app.app_context():
+        db.session.execute(f'DROP SCHEMA {SCHEMA} CASCADE')
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def replica_app(app):
+    # an app whose 'replica' bind is a schema of its own, with tables nothing
+    # copies the primary's rows to, so each page shows where it was read from
+    from app import create_app
+    from extensions import db
+
+    replica_app = create_app(SQLALCHEMY_DATABASE_URI=app.config['SQLALCHEMY_DATABASE_URI'],
+                             SQLALCHEMY_BINDS={'replica': schema_url(os.environ['DATABASE_URL'], REPLICA_SCHEMA)},
+                             CACHE_BACKEND=None, TESTING=True)
+    with replica_app.app_context():
+        engine = db.get_engine(replica_app, bind='replica')
+        engine.execute(f'DROP SCHEMA IF EXISTS {REPLICA_SCHEMA} CASCADE')
+        engine.execute(f'CREATE SCHEMA {REPLICA_SCHEMA}')
+        db.Model.metadata.create_all(bind=engine, checkfirst=False)
+
+    yield replica_app
+
+    with replica_app.app_context():
+        engine.execute(f'DROP SCHEMA {REPLICA_SCHEMA} CASCADE')
+        engine.dispose()
+        db.get_engine(replica_app).dispose()
+
+
+@pytest.fixture
+def database(app):
+    # empty tables for every test
+    from extensions import db
+
+    yield db
+    with app.app_context():
+        db.session.execute('TRUNCATE "Show", "Venue", "Artist" RESTART IDENTITY CASCADE')
+        db.session.commit()
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app, database):
+    return app.test_client()
+
+
+@pytest.fixture
+def statements(app, database):
+    # (statement, parameters) of every statement sent to the database
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    with app.app_context():
+        engine = database.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+@pytest.fixture
+def seed(app, database):
+    # seed(venues, artists, shows) adds that many venues and artists and
+    # books shows at every venue, a day apart, half of them past, each with
+    # a different artist (no artist plays twice a day as long as there are
+    # at least as many artists as venues); returns the venue and artist ids
+    from models import Venue, Artist, Show, count_shows
+
+    def seed(venues, artists=None, shows=2):
+        artists = venues if artists is None else artists
+        with app.app_context():
+            venue_rows = [Venue(name=f'The Musical Hop {number}', city='San Francisco', state='CA',
+                                address='1015 Folsom Street', genres=['Jazz']) for number in range(venues)]
+            artist_rows = [Artist(name=f'Guns N Petals {number}', city='San Francisco', state='CA',
+                                  genres=['Rock n Roll']) for number in range(artists)]
+            database.session.add_all(venue_rows + artist_rows)
+            database.session.flush()
+
+            now = datetime.now()
+            for index, venue in enumerate(venue_rows):
+                for day in range(shows):
+                    start_time = now + timedelta(days=day - shows // 2, hours=1)
+                    database.session.add(Show(venue_id=venue.id, artist_id=artist_rows[(index + day) % artists].id,
+                                              start_time=start_time, past=start_time <= now))
+            database.session.flush()
+            count_shows([])
+            database.session.commit()
+            ids = [venue.id for venue in venue_rows], [artist.id for artist in artist_rows]
+            database.session.remove()
+        return ids
+
+    return seed
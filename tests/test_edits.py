@@ -0,0 +1,24 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import pytest
+
+#----------------------------------------------------------------------------#
+# Edits.
+#----------------------------------------------------------------------------#
+
+# A submission missing some of the form's fields is reported like any other
+# failed update, with a flashed error on the page it redirects to.
+
+
+@pytest.mark.parametrize('kind', ['artists', 'venues'])
+def test_missing_field(client, seed, kind):
+    venue_ids, artist_ids = seed(1, shows=0)
+    id = (artist_ids if kind == 'artists' else venue_ids)[0]
+    response = client.post(f'/{kind}/{id}/edit', data={'name': 'The Dueling Pianos'})
+    assert response.status_code == 302
+    assert response.location.endswith(f'/{kind}/{id}')
+    page = client.get(response.location)
+    assert b'An error occurred.' in page.data
+    assert b'could not be updated' in page.data
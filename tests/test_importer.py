@@ -0,0 +1,52 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+# Rows that cannot be read or fail validation are reported by line and
+# skipped, the valid rows around them are still imported.
+
+VENUE = {
+    'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA', 'address': '1015 Folsom Street',
+    'phone': '123-123-1234', 'genres': ['Jazz', 'Folk'], 'facebook_link': 'https://www.facebook.com/TheMusicalHop',
+    'website': 'https://www.themusicalhop.com', 'seeking_talent': True,
+}
+
+
+def import_lines(app, tmp_path, kind, lines, batch_size=1000):
+    from importer import import_rows
+
+    path = tmp_path / f'{kind}.jsonl'
+    path.write_text('\n'.join(lines) + '\n')
+    with app.app_context():
+        report = import_rows(kind, str(path), batch_size)
+    return report
+
+
+def test_unreadable_lines(app, database, tmp_path):
+    from models import Venue
+
+    lines = [json.dumps(VENUE), '{"name": "The Dueling', '[]', '"x"', '3', json.dumps(dict(VENUE, name='Park Square'))]
+    report = import_lines(app, tmp_path, 'venues', lines, batch_size=10)
+    assert report.imported == 2
+    assert [line for line, _ in report.errors] == [2, 3, 4, 5]
+    assert report.errors[0][1].startswith('not valid JSON')
+    assert all(message == 'not a JSON object' for _, message in report.errors[1:])
+    with app.app_context():
+        assert sorted(name for name, in database.session.query(Venue.name)) == ['Park Square', 'The Musical Hop']
+        database.session.remove()
+
+
+def test_show_without_start_time(app, seed, tmp_path):
+    (venue_id, *_), (artist_id, *_) = seed(1, shows=0)
+    show = {'venue_id': venue_id, 'artist_id': artist_id}
+    lines = [json.dumps(show), json.dumps(dict(show, start_time=None)),
+             json.dumps(dict(show, start_time='2035-05-21T21:30:00'))]
+    report = import_lines(app, tmp_path, 'shows', lines)
+    assert report.imported == 1
+    assert report.errors == [(1, 'start_time: This field is required.'), (2, 'start_time: This field is required.')]
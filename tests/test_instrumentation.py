@@ -0,0 +1,56 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+import logging
+
+import pytest
+
+#----------------------------------------------------------------------------#
+# Instrumentation.
+#----------------------------------------------------------------------------#
+
+# Request lines go to INSTRUMENTATION_LOG and nowhere else, the error log
+# (the app logger's handler outside debug mode) in particular.
+
+
+@pytest.fixture
+def instrumented_app(tmp_path):
+    from app import create_app
+
+    path = tmp_path / 'instrumentation.log'
+    app = create_app(SQLALCHEMY_BINDS={}, CACHE_BACKEND=None, TESTING=True, INSTRUMENTATION_LOG=str(path))
+    yield app, path
+    for name in ('requests', 'sql'):
+        logger = app.logger.getChild(name)
+        for handler in [handler for handler in logger.handlers if getattr(handler, 'baseFilename', None) == str(path)]:
+            logger.removeHandler(handler)
+            handler.close()
+
+
+class Recorder(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_request_line(instrumented_app):
+    app, path = instrumented_app
+    recorder = Recorder()
+    app.logger.addHandler(recorder)
+    try:
+        response = app.test_client().get('/')
+    finally:
+        app.logger.removeHandler(recorder)
+    assert response.status_code == 200
+    assert 'Server-Timing' in response.headers
+
+    line, = path.read_text().splitlines()
+    record = json.loads(line.split(': ', 1)[1])
+    assert record['route'] == 'main.index'
+    assert record['status'] == 200
+    assert not recorder.records
@@ -0,0 +1,52 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import importlib.util
+import runpy
+import threading
+
+import pytest
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# The in-memory cache is only used by default when a single process serves
+# requests, since writes only invalidate the copy of the process making them.
+
+CONFIG = importlib.util.find_spec('config').origin
+
+
+@pytest.mark.parametrize('environ, backend', [
+    ({}, 'memory'),
+    ({'WEB_CONCURRENCY': '1'}, 'memory'),
+    ({'WEB_CONCURRENCY': '4'}, None),
+    ({'WEB_CONCURRENCY': '4', 'CACHE_URL': 'redis://localhost:6379/0'}, 'shared'),
+    ({'CACHE_URL': 'redis://localhost:6379/0'}, 'shared'),
+    ({'WEB_CONCURRENCY': '4', 'CACHE_BACKEND': 'memory'}, 'memory'),
+])
+def test_default_backend(monkeypatch, environ, backend):
+    for name in ('WEB_CONCURRENCY', 'CACHE_URL', 'CACHE_BACKEND'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in environ.items():
+        monkeypatch.setenv(name, value)
+    assert runpy.run_path(CONFIG)['CACHE_BACKEND'] == backend
+
+
+def test_counts_from_threads():
+    from cache import PageCache, MemoryBackend
+
+    page_cache = PageCache(MemoryBackend())
+    page_cache.store('page', 'body', page_cache.lookup('page', ['venues'])[1])
+
+    def lookups():
+        for number in range(1000):
+            page_cache.lookup('page' if number % 2 else 'other', ['venues'])
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (page_cache.hits, page_cache.misses) == (4000, 4001)
@@ -0,0 +1,67 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import base64
+import html
+import json
+import re
+
+import pytest
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+# Following the next page links from the first page lists every row once,
+# rows whose sort keys are NULL included.
+
+
+def follow_pages(client, url, pattern):
+    # the ids matching pattern on every page, in order
+    ids = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        page = response.data.decode()
+        ids += [int(id) for id in re.findall(pattern, page)]
+        next_link = re.search(r'<li class="next"><a href="([^"]+)"', page)
+        url = next_link and html.unescape(next_link.group(1))
+    return ids
+
+
+@pytest.fixture
+def profiles(app, database):
+    # venues and artists with and without the values they are sorted by
+    from models import Venue, Artist
+
+    with app.app_context():
+        venues = [Venue(name=f'The Musical Hop {number}', city=city, state=state, genres=['Jazz'])
+                  for number, (city, state) in enumerate([('San Francisco', 'CA'), (None, None), ('Austin', None),
+                                                          (None, 'TX'), ('New York', 'NY')] * 2)]
+        artists = [Artist(name=name, city='San Francisco', state='CA', genres=['Jazz'])
+                   for name in ['Guns N Petals', None, 'Matt Quevedo', None, 'The Wild Sax Band'] * 2]
+        database.session.add_all(venues + artists)
+        database.session.commit()
+        ids = sorted(venue.id for venue in venues), sorted(artist.id for artist in artists)
+        database.session.remove()
+    return ids
+
+
+@pytest.mark.parametrize('per_page', [1, 3])
+def test_venues_pages(client, profiles, per_page):
+    venue_ids, _ = profiles
+    ids = follow_pages(client, f'/venues?per_page={per_page}', r'href="/venues/(\d+)"')
+    assert sorted(ids) == venue_ids
+
+
+@pytest.mark.parametrize('per_page', [1, 3])
+def test_artists_pages(client, profiles, per_page):
+    _, artist_ids = profiles
+    ids = follow_pages(client, f'/artists?per_page={per_page}', r'href="/artists/(\d+)"')
+    assert sorted(ids) == artist_ids
+
+
+def test_null_cursor_rejected(client, profiles):
+    token = base64.urlsafe_b64encode(json.dumps([None, 1]).encode()).decode()
+    assert client.get(f'/artists?after={token}').status_code == 400
@@ -0,0 +1,97 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import time
+
+import pytest
+from sqlalchemy import event
+
+#----------------------------------------------------------------------------#
+# Read replica.
+#----------------------------------------------------------------------------#
+
+# Read views query the replica, writes the primary, and a client that has
+# just written reads from the primary until REPLICA_LAG has passed. The
+# replica here is a schema of its own that never catches up, so a page shows
+# which of the two it was read from.
+
+VENUE_FORM = {
+    'name': 'The Dueling Pianos Bar', 'city': 'New York', 'state': 'NY', 'address': '335 Delancey Street',
+    'phone': '914-003-1132', 'genres': ['Classical'], 'image_link': '', 'facebook_link': '', 'website': '',
+    'seeking_description': '',
+}
+
+
+@pytest.fixture
+def routed(replica_app, database):
+    # (bind, statement) of every statement, bind being 'primary' or 'replica'
+    executed = []
+    with replica_app.app_context():
+        engines = {'primary': database.get_engine(replica_app),
+                   'replica': database.get_engine(replica_app, bind='replica')}
+
+    def recorder(bind):
+        def record(conn, cursor, statement, parameters, context, executemany):
+            executed.append((bind, statement))
+        return record
+
+    listeners = [(engine, recorder(bind)) for bind, engine in engines.items()]
+    for engine, record in listeners:
+        event.listen(engine, 'before_cursor_execute', record)
+    yield executed
+    for engine, record in listeners:
+        event.remove(engine, 'before_cursor_execute', record)
+    engines['replica'].execute('TRUNCATE "Show", "Venue", "Artist" RESTART IDENTITY CASCADE')
+
+
+def binds(executed):
+    return {bind for bind, _ in executed}
+
+
+def test_reads_go_to_the_replica(replica_app, database, routed):
+    database.get_engine(replica_app, bind='replica').execute(
+        """INSERT INTO "Venue" (name, city, state, genres) VALUES ('The Replica Hall', 'San Francisco', 'CA', '{Jazz}')""")
+    routed.clear()
+    response = replica_app.test_client().get('/venues')
+    assert response.status_code == 200
+    assert b'The Replica Hall' in response.data
+    assert binds(routed) == {'replica'}
+
+
+def test_writes_go_to_the_primary(replica_app, routed):
+    response = replica_app.test_client().post('/venues/create', data=VENUE_FORM)
+    assert response.status_code == 200
+    assert b'was successfully listed' in response.data
+    assert binds(routed) == {'primary'}
+
+
+def test_reads_after_a_write_are_pinned(replica_app, routed):
+    writer, reader = replica_app.test_client(), replica_app.test_client()
+    writer.post('/venues/create', data=VENUE_FORM)
+
+    routed.clear()
+    assert b'The Dueling Pianos Bar' in writer.get('/venues').data
+    assert binds(routed) == {'primary'}
+
+    routed.clear()
+    assert b'The Dueling Pianos Bar' not in reader.get('/venues').data
+    assert binds(routed) == {'replica'}
+
+
+def test_searches_do_not_pin(replica_app, routed):
+    client = replica_app.test_client()
+    client.post('/venues/search', data={'search_term': 'Hop'})
+    with client.session_transaction() as session:
+        assert 'read_primary_until' not in session
+
+    # nor extend the pin of a client that has just written
+    until = time.time() + 1
+    with client.session_transaction() as session:
+        session['read_primary_until'] = until
+    routed.clear()
+    response = client.post('/artists/search', data={'search_term': 'Petals'})
+    assert response.status_code == 200
+    assert binds(routed) == {'primary'}
+    with client.session_transaction() as session:
+        assert session['read_primary_until'] == until
@@ -0,0 +1,61 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+import pytest
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# The rollover-shows command moves started shows from the upcoming to the
+# past counters and invalidates the cached pages of their venues and artists.
+
+
+@pytest.fixture
+def page_cache(app, monkeypatch):
+    from cache import PageCache, MemoryBackend
+
+    page_cache = PageCache(MemoryBackend())
+    monkeypatch.setitem(app.extensions, 'page_cache', page_cache)
+    return page_cache
+
+
+def counters(app, database, model):
+    with app.app_context():
+        rows = database.session.query(model.id, model.past_shows_count, model.upcoming_shows_count).all()
+        database.session.remove()
+    return {id: (past, upcoming) for id, past, upcoming in rows}
+
+
+def test_rollover(app, client, seed, database, page_cache):
+    from models import Venue, Show
+
+    (venue_id, other_venue_id), _ = seed(2, shows=2)
+    with app.app_context():
+        # the venue's upcoming show has started since it was booked
+        show = Show.query.filter_by(venue_id=venue_id, past=False).one()
+        show.start_time = datetime.now() - timedelta(minutes=5)
+        artist_id = show.artist_id
+        database.session.commit()
+        database.session.remove()
+    assert counters(app, database, Venue) == {venue_id: (1, 1), other_venue_id: (1, 1)}
+
+    for url in ('/venues', f'/venues/{other_venue_id}'):
+        client.get(url)
+    hits = page_cache.hits
+
+    result = app.test_cli_runner().invoke(args=['rollover-shows'])
+    assert result.exit_code == 0, result.output
+    assert '1 show(s) moved' in result.output
+    assert counters(app, database, Venue) == {venue_id: (2, 0), other_venue_id: (1, 1)}
+
+    with app.app_context():
+        generations = page_cache.backend.generations(['venues', 'shows', f'venue:{venue_id}', f'artist:{artist_id}'])
+    assert generations == [1, 1, 1, 1]
+    client.get('/venues')
+    client.get(f'/venues/{other_venue_id}')
+    # /venues is rendered again, the other venue's page is still cached
+    assert page_cache.hits == hits + 1
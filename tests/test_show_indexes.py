@@ -0,0 +1,59 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import pytest
+
+#----------------------------------------------------------------------------#
+# Show indexes.
+#----------------------------------------------------------------------------#
+
+# The queries a page runs are captured, then explained with the statistics
+# of a freshly analyzed dataset. Sequential scans are turned off: on a table
+# this small the planner would rightly prefer them, and the point is whether
+# the query can use the index at all (e.g. a function on start_time or an
+# ORDER BY the index does not cover would rule it out).
+
+
+def explain(database, executed):
+    # the plans of the SELECT statements, as one text
+    connection = database.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute('SET enable_seqscan = off')
+        plans = []
+        for statement, parameters in executed:
+            if statement.lstrip().upper().startswith('SELECT'):
+                cursor.execute('EXPLAIN ' + statement, parameters)
+                plans += [line for line, in cursor.fetchall()]
+        return '\n'.join(plans)
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+@pytest.fixture
+def analyzed(app, seed, database):
+    ids = seed(10, 10, shows=6)
+    with app.app_context():
+        for table in ('Venue', 'Artist', 'Show'):
+            database.session.execute(f'ANALYZE "{table}"')
+        database.session.commit()
+        database.session.remove()
+    return ids
+
+
+@pytest.mark.parametrize('page, index', [
+    ('/venues/{venue_id}', 'ix_Show_venue_id_start_time'),
+    ('/artists/{artist_id}', 'ix_Show_artist_id_start_time'),
+    ('/shows', 'ix_Show_start_time_id'),
+])
+def test_page_uses_index(app, client, analyzed, statements, database, page, index):
+    (venue_id, *_), (artist_id, *_) = analyzed
+    statements.clear()
+    response = client.get(page.format(venue_id=venue_id, artist_id=artist_id))
+    assert response.status_code == 200
+    executed = list(statements)
+    with app.app_context():
+        plan = explain(database, executed)
+    assert index in plan, plan
@@ -0,0 +1,65 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import pytest
+
+#----------------------------------------------------------------------------#
+# Statement counts.
+#----------------------------------------------------------------------------#
+
+# Pages run a fixed number of statements however many rows they show: a
+# query per venue, show or artist (e.g. a lazy load in a loop) fails here.
+
+
+@pytest.mark.parametrize('venues', [3, 30])
+def test_venues_listing(client, seed, statements, venues):
+    venue_ids, _ = seed(venues)
+    statements.clear()
+    response = client.get('/venues')
+    assert response.status_code == 200
+    assert all(f'href="/venues/{id}"'.encode() in response.data for id in venue_ids)
+    assert len(statements) == 1
+
+
+@pytest.mark.parametrize('artists', [3, 30])
+def test_artists_listing(client, seed, statements, artists):
+    _, artist_ids = seed(3, artists)
+    statements.clear()
+    response = client.get('/artists')
+    assert response.status_code == 200
+    assert all(f'href="/artists/{id}"'.encode() in response.data for id in artist_ids)
+    assert len(statements) == 1
+
+
+@pytest.mark.parametrize('venues', [3, 30])
+def test_shows_listing(client, seed, statements, venues):
+    seed(venues, shows=2)
+    statements.clear()
+    response = client.get('/shows?per_page=200')
+    assert response.status_code == 200
+    assert response.data.count(b'href="/venues/') >= 2 * venues
+    # the validators, then the shows joined to their venues and artists
+    assert len(statements) == 2
+
+
+@pytest.mark.parametrize('shows', [2, 20])
+def test_venue_page(client, seed, statements, shows):
+    (venue_id, *_), _ = seed(3, 30, shows=shows)
+    statements.clear()
+    response = client.get(f'/venues/{venue_id}')
+    assert response.status_code == 200
+    assert response.data.count(b'href="/artists/') >= shows
+    # the validators, then the venue joined to its shows and their artists
+    assert len(statements) == 2
+
+
+@pytest.mark.parametrize('shows', [2, 20])
+def test_artist_page(client, seed, statements, shows):
+    # every venue books the first artist on a day of its own
+    _, (artist_id, *_) = seed(shows, shows, shows=shows)
+    statements.clear()
+    response = client.get(f'/artists/{artist_id}')
+    assert response.status_code == 200
+    assert response.data.count(b'href="/venues/') >= shows
+    assert len(statements) == 2